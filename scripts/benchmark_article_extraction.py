@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Compare the extractive law-article path (references taken straight from the
+retrieved chunks) with the generative one on QA article questions: per-question
+latency, fallback rate, and agreement of the returned article references
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import numpy as np
+
+from src.models.rag_model import LegalRAGModel
+from src.utils.articles import article_keys, parse_article_answer
+from src.utils.helpers import load_config, build_rag_config, read_table, setup_device
+
+def answer_timed(rag_model, question, top_k, threshold):
+    """Answer, wall time and whether the generator ran."""
+    start = time.perf_counter()
+    prepared = rag_model.prepare_prompts([question], top_k=top_k, threshold=threshold)[0]
+    generated = not isinstance(prepared, str)
+    answer = rag_model.generate_from_prompts([question], [prepared])[0] if generated else prepared
+    return answer, time.perf_counter() - start, generated
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-path", default="models/trained/finetuned_aragpt")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--output", default="results/article_extraction.json")
+    args = parser.parse_args()
+
+    config = load_config()
+    config['answer_cache'] = {'enabled': False}
+    rag_model = LegalRAGModel(build_rag_config(config, args.model_path, setup_device()))
+    rag_model.load_models(
+        config['index']['index_path'],
+        config['index']['mapping_path'],
+        config['index']['chunk_text_path']
+    )
+
+    questions = read_table(config['data']['cleaned_qa_path'], columns=['question'])['question'].tolist()
+    questions = rag_model.generator.law_article_questions(questions)[:args.limit]
+    print(f"📊 {len(questions)} law-article questions")
+
+    answer_timed(rag_model, questions[0], args.top_k, args.threshold)  # warm-up
+
+    rows = []
+    for question in questions:
+        rag_model.article_mode = "generative"
+        generative, generative_time, _ = answer_timed(rag_model, question, args.top_k, args.threshold)
+        rag_model.article_mode = "extractive"
+        extractive, extractive_time, fallback = answer_timed(rag_model, question, args.top_k, args.threshold)
+
+        generative_keys = article_keys(parse_article_answer(generative))
+        extractive_keys = article_keys(parse_article_answer(extractive))
+        union = generative_keys | extractive_keys
+        rows.append({
+            "question": question,
+            "generative_s": generative_time,
+            "extractive_s": extractive_time,
+            "fallback": fallback,
+            "exact_match": generative_keys == extractive_keys,
+            "jaccard": len(generative_keys & extractive_keys) / len(union) if union else 1.0,
+            "generative_refs": len(generative_keys),
+            "extractive_refs": len(extractive_keys)
+        })
+
+    generative_times = [r['generative_s'] for r in rows]
+    extractive_times = [r['extractive_s'] for r in rows]
+    summary = {
+        "questions": len(rows),
+        "fallback_rate": sum(r['fallback'] for r in rows) / len(rows),
+        "exact_match_rate": sum(r['exact_match'] for r in rows) / len(rows),
+        "mean_jaccard": float(np.mean([r['jaccard'] for r in rows])),
+        "generative_p50_s": float(np.percentile(generative_times, 50)),
+        "generative_p99_s": float(np.percentile(generative_times, 99)),
+        "extractive_p50_s": float(np.percentile(extractive_times, 50)),
+        "extractive_p99_s": float(np.percentile(extractive_times, 99)),
+        "speedup": sum(generative_times) / sum(extractive_times)
+    }
+
+    for key, value in summary.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "questions": rows}, f, ensure_ascii=False, indent=2)
+    print(f"✅ Article extraction results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
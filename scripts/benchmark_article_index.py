@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark the law-article inverted index: lookup latency, and how many of the
+top_k chunks actually cite the asked article with dense search alone versus
+the article-filtered search
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import numpy as np
+
+from src.models.article_index import ArticleIndex
+from src.models.retriever import Retriever
+from src.utils.helpers import load_config, setup_device
+
+def article_queries(index, limit, seed=0):
+    """Questions citing (article, law) pairs sampled from the index, with their citing chunks."""
+    keys = [(article, law) for article, law in index.keys() if law]
+    rng = np.random.default_rng(seed)
+    sample = [keys[i] for i in rng.choice(len(keys), min(limit, len(keys)), replace=False)]
+    return [(f"ما هي المادة {article} من قانون {law}؟", set(index.lookup(article, law).tolist()))
+            for article, law in sample]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", default="results/article_index.json")
+    args = parser.parse_args()
+
+    config = load_config()
+    index_config = config['index']
+    start = time.perf_counter()
+    index = ArticleIndex.load(index_config['article_index_path'])
+    load_time = time.perf_counter() - start
+    queries = article_queries(index, args.queries)
+    print(f"📊 {len(index)} law articles in {len(index.laws)} laws over {index.n_docs} chunks, "
+          f"{len(queries)} queries, top_k={args.top_k}")
+
+    lookup_latencies = []
+    for question, _ in queries:
+        start = time.perf_counter()
+        index.search(question)
+        lookup_latencies.append((time.perf_counter() - start) * 1e6)
+
+    retrieval = config['retrieval']
+    retriever = Retriever(config['model']['embedding_model'], setup_device(),
+                          group_by_case=retrieval.get('group_by_case', False),
+                          article_filter=True,
+                          article_max_candidates=retrieval.get('article_max_candidates', 2000))
+    retriever.load_index(index_config['index_path'], index_config['mapping_path'],
+                         index_config['chunk_text_path'], index_config=index_config)
+    retriever.retrieve_batch([queries[0][0]], top_k=args.top_k)  # warm-up
+
+    results = {}
+    for name, article_index in (("dense", None), ("article_filter", index)):
+        retriever.article_index = article_index
+        latencies, precisions = [], []
+        for question, citing in queries:
+            start = time.perf_counter()
+            _, chunk_ids, _ = retriever.retrieve_batch([question], top_k=args.top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits = [int(i) for i in chunk_ids[0] if i >= 0]
+            precisions.append(sum(i in citing for i in hits) / len(hits) if hits else 0.0)
+        results[name] = {
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "citing_precision": float(np.mean(precisions))
+        }
+
+    summary = {
+        "law_articles": len(index),
+        "load_s": load_time,
+        "lookup_p50_us": float(np.percentile(lookup_latencies, 50)),
+        "lookup_p99_us": float(np.percentile(lookup_latencies, 99)),
+        **{f"{name}_{key}": value for name, result in results.items() for key, value in result.items()}
+    }
+    for key, value in summary.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"✅ Article index results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
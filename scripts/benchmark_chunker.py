@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark the token-offset chunking engine against the LangChain splitter
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import numpy as np
+from transformers import AutoTokenizer
+
+from src.data_processing.chunker import DocumentChunker
+from src.utils.helpers import load_config
+
+def chunk_stats(tokenizer, chunks_per_doc):
+    """Summarize chunk counts and token lengths."""
+    lengths = np.array([
+        len(tokenizer.tokenize(chunk)) for chunks in chunks_per_doc for chunk in chunks
+    ])
+    return {
+        "chunks": int(len(lengths)),
+        "mean_tokens": float(lengths.mean()) if len(lengths) else 0.0,
+        "max_tokens": int(lengths.max()) if len(lengths) else 0,
+    }
+
+def main():
+    config = load_config()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", default=config['data']['cleaned_legal_path'])
+    parser.add_argument("--workers", type=int, default=config['chunking'].get('num_workers', 4))
+    parser.add_argument("--repeat", type=int, default=1, help="Replicate the corpus to simulate a larger one")
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(config['model']['embedding_model'])
+    size = config['chunking']['chunk_size']
+    overlap = config['chunking']['chunk_overlap']
+
+    runs = [
+        ("langchain", DocumentChunker(tokenizer, size, overlap, engine="langchain")),
+        ("fast x1", DocumentChunker(tokenizer, size, overlap, engine="fast", num_workers=1)),
+        (f"fast x{args.workers}", DocumentChunker(tokenizer, size, overlap, engine="fast", num_workers=args.workers)),
+    ]
+
+    print(f"📊 Chunking {args.data} (x{args.repeat}), chunk_size={size}, chunk_overlap={overlap}")
+    print("=" * 60)
+
+    for name, chunker in runs:
+        start = time.perf_counter()
+        chunks_per_doc = []
+        for _ in range(args.repeat):
+            df = chunker.chunk_legal_data(args.data)
+            chunks_per_doc.extend(df['case_chunks'].tolist())
+        elapsed = time.perf_counter() - start
+
+        stats = chunk_stats(tokenizer, chunks_per_doc)
+        print(
+            f"{name:<12} {elapsed:8.2f}s  chunks={stats['chunks']}  "
+            f"mean_tokens={stats['mean_tokens']:.1f}  max_tokens={stats['max_tokens']} (limit {size})"
+        )
+
+if __name__ == "__main__":
+    main()
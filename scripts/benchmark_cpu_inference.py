@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Compare the CPU inference profiles (fp32 baseline, bf16, dynamic int8):
+retrieval and generation quality with RAGEvaluator, query-embedding and
+answer latency, and model size
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import numpy as np
+
+from src.evaluation.evaluator import RAGEvaluator
+from src.models.cpu_inference import PRECISIONS, model_size_mb
+from src.models.rag_model import LegalRAGModel
+from src.utils.helpers import load_config, build_rag_config, read_table
+
+def time_per_item(fn, items):
+    """Per-item wall times (ms) of fn(item)."""
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--precisions", type=lambda v: v.split(","), default=list(PRECISIONS))
+    parser.add_argument("--model-path", default="models/trained/finetuned_aragpt")
+    parser.add_argument("--limit", type=int, default=100, help="QA questions used for generation quality")
+    parser.add_argument("--latency-questions", type=int, default=20)
+    parser.add_argument("--output", default="results/cpu_inference.json")
+    args = parser.parse_args()
+
+    config = load_config()
+    # Caches would hide the model cost being measured
+    config['retrieval']['query_cache_size'] = 0
+    config['answer_cache'] = {'enabled': False}
+    cpu_config = config.get('cpu_inference', {})
+    qa_df = read_table(config['data']['cleaned_qa_path'], columns=['question', 'answer', 'case_id'])
+    gen_df = qa_df.head(args.limit)
+    latency_questions = qa_df['question'].head(args.latency_questions).tolist()
+    evaluator = RAGEvaluator()
+
+    results = []
+    for precision in args.precisions:
+        print(f"\n⚙️ CPU profile: {precision}")
+        config['cpu_inference'] = {
+            **cpu_config, 'enabled': True,
+            'embedding_precision': precision, 'generator_precision': precision
+        }
+        rag_model = LegalRAGModel(build_rag_config(config, args.model_path, "cpu"))
+        rag_model.load_models(
+            config['index']['index_path'],
+            config['index']['mapping_path'],
+            config['index']['chunk_text_path']
+        )
+
+        retrieval_metrics = evaluator.evaluate_retriever(qa_df, rag_model, k_values=[10, 50])
+        generation_metrics = evaluator.evaluate_generator(gen_df, rag_model)
+
+        embedding_model = rag_model.retriever.embedding_model
+        embed_ms = time_per_item(
+            lambda q: embedding_model._encode_queries([q], config['retrieval']['embedding_method']),
+            latency_questions
+        )
+        answer_ms = time_per_item(rag_model.generate_answer, latency_questions)
+
+        result = {
+            "precision": precision,
+            "retrieval_metrics": retrieval_metrics,
+            "BLEU": generation_metrics['BLEU'],
+            "BERTScore_F1": generation_metrics['BERTScore_F1'],
+            "embed_p50_ms": float(np.percentile(embed_ms, 50)),
+            "answer_p50_ms": float(np.percentile(answer_ms, 50)),
+            "answer_p95_ms": float(np.percentile(answer_ms, 95)),
+            "embedding_model_mb": model_size_mb(embedding_model.model) if embedding_model.model is not None else float("nan"),
+            "generator_mb": model_size_mb(rag_model.generator.model),
+            "load_times": dict(rag_model.load_report)
+        }
+        results.append(result)
+        del rag_model
+
+    baseline = next((r for r in results if r['precision'] == "fp32"), results[0])
+    print(f"\n{'profile':<8} {'Hit@10':>7} {'BLEU':>6} {'BERT F1':>8} {'embed ms':>9} {'answer ms':>10} "
+          f"{'speedup':>8} {'enc MB':>7} {'gen MB':>7}")
+    for r in results:
+        print(f"{r['precision']:<8} {r['retrieval_metrics'][10]['Hit@k']:7.4f} {r['BLEU']:6.2f} "
+              f"{r['BERTScore_F1']:8.4f} {r['embed_p50_ms']:9.1f} {r['answer_p50_ms']:10.1f} "
+              f"{baseline['answer_p50_ms'] / r['answer_p50_ms']:7.2f}x "
+              f"{r['embedding_model_mb']:7.0f} {r['generator_mb']:7.0f}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"results": results}, f, indent=2)
+    print(f"✅ CPU inference comparison saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compare the exported encoder backends (TorchScript, ONNX Runtime) with eager
+PyTorch on CPU: embedding equivalence, single-query latency and bulk
+chunk-embedding throughput
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import numpy as np
+
+from src.models.chunk_store import ChunkTextStore
+from src.models.embedding_backends import BACKENDS
+from src.models.embeddings import EmbeddingModel
+from src.utils.helpers import load_config, read_table
+
+DEFAULT_PATHS = {"torchscript": "models/encoder/e5.pt", "onnx": "models/encoder/e5.onnx"}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", type=lambda v: v.split(","), default=list(BACKENDS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--atol", type=float, default=1e-4, help="Max allowed abs difference from eager torch")
+    parser.add_argument("--output", default="results/embedding_backends.json")
+    args = parser.parse_args()
+
+    config = load_config()
+    method = config['retrieval']['embedding_method']
+    max_tokens = config['embedding'].get('max_tokens_per_batch') or 8192
+    questions = read_table(config['data']['cleaned_qa_path'], columns=['question'])['question'].tolist()[:args.queries]
+    store = ChunkTextStore(config['index']['chunk_text_path'])
+    chunks = [store[i] for i in range(min(args.chunks, len(store)))]
+    print(f"📊 {len(questions)} queries, {len(chunks)} chunks, method={method}")
+
+    reference = None
+    results = []
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        model = EmbeddingModel(
+            config['model']['embedding_model'], "cpu",
+            backend=backend, backend_path=DEFAULT_PATHS.get(backend)
+        )
+        model.embed_queries(questions[:4], method=method)  # warm-up
+
+        latencies = []
+        query_embeds = []
+        for question in questions:
+            start = time.perf_counter()
+            query_embeds.append(model.embed_queries([question], method=method)[0])
+            latencies.append((time.perf_counter() - start) * 1000)
+        query_embeds = np.vstack(query_embeds)
+
+        start = time.perf_counter()
+        chunk_embeds = model.embed_texts(chunks, method=method, max_tokens_per_batch=max_tokens).numpy()
+        bulk_time = time.perf_counter() - start
+
+        embeds = np.vstack([query_embeds, chunk_embeds])
+        if reference is None:
+            reference = embeds
+        max_diff = float(np.abs(embeds - reference).max())
+        min_cosine = float((embeds * reference).sum(axis=1).min())
+
+        result = {
+            "backend": backend,
+            "max_abs_diff": max_diff,
+            "min_cosine": min_cosine,
+            "equivalent": max_diff <= args.atol,
+            "query_p50_ms": float(np.percentile(latencies, 50)),
+            "query_p99_ms": float(np.percentile(latencies, 99)),
+            "bulk_chunks_per_s": len(chunks) / bulk_time,
+            "load_s": model.load_report.get("embedding_model", 0.0)
+        }
+        results.append(result)
+        del model
+
+    baseline = results[0]
+    print(f"\n{'backend':<12} {'max diff':>9} {'min cos':>9} {'q p50 ms':>9} {'q p99 ms':>9} "
+          f"{'chunks/s':>9} {'q speedup':>10} {'bulk speedup':>13}")
+    for r in results:
+        print(f"{r['backend']:<12} {r['max_abs_diff']:9.2e} {r['min_cosine']:9.6f} {r['query_p50_ms']:9.2f} "
+              f"{r['query_p99_ms']:9.2f} {r['bulk_chunks_per_s']:9.1f} "
+              f"{baseline['query_p50_ms'] / r['query_p50_ms']:9.2f}x "
+              f"{r['bulk_chunks_per_s'] / baseline['bulk_chunks_per_s']:12.2f}x")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"atol": args.atol, "results": results}, f, indent=2)
+    print(f"✅ Backend comparison saved to {args.output}")
+
+    if not all(r['equivalent'] for r in results):
+        print(f"❌ Some backends differ from eager torch by more than {args.atol}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Benchmark BM25 postings-list query latency against corpus size
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import numpy as np
+
+from src.models.chunk_store import ChunkTextStore
+from src.models.lexical_index import BM25Index
+from src.utils.helpers import load_config, read_table
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", type=parse_ints, default=[1, 2, 4, 8, 16],
+                        help="Corpus sizes as multiples of the chunk store")
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    config = load_config()
+    chunks = list(ChunkTextStore(config['index']['chunk_text_path']))
+    questions = read_table(config['data']['cleaned_qa_path'], columns=['question'])['question'].tolist()
+
+    print(f"📊 {len(chunks)} chunks, {len(questions)} QA questions, top_k={args.top_k}")
+    print(f"{'chunks':>10} {'build s':>8} {'postings':>10} {'MB':>7} {'p50 us':>8} {'p99 us':>8}")
+    for scale in args.scales:
+        start = time.perf_counter()
+        index = BM25Index().build(chunks * scale)
+        build_time = time.perf_counter() - start
+        size_mb = (index.doc_ids.nbytes + index.weights.nbytes + index.term_offsets.nbytes) / 2**20
+
+        latencies = []
+        for question in questions:
+            start = time.perf_counter()
+            index.search(question, top_k=args.top_k)
+            latencies.append((time.perf_counter() - start) * 1e6)
+
+        print(f"{index.n_docs:>10} {build_time:8.2f} {len(index.doc_ids):>10} {size_mb:7.1f} "
+              f"{np.percentile(latencies, 50):8.1f} {np.percentile(latencies, 99):8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Check that the translation-table normalize_arabic matches the original
+multi-regex implementation, and time both on the legal corpus
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+
+from src.utils.helpers import load_config, normalize_arabic, normalize_arabic_batch, read_table
+from tests.normalization_reference import fuzz_strings, normalize_arabic_reference
+
+def load_corpus(config):
+    """Collect every cell of the legal and QA tables."""
+    values = []
+    for path in [config['data']['legal_data_path'], config['data']['qa_data_path'],
+                 config['data']['cleaned_legal_path'], config['data']['cleaned_qa_path']]:
+        if os.path.exists(path):
+            df = read_table(path)
+            for col in df.columns:
+                values.extend(df[col].tolist())
+    return values
+
+def check_equivalence(values):
+    """Return the inputs where the new and reference implementations disagree."""
+    batch = normalize_arabic_batch(values)
+    return [
+        value for value, fast in zip(values, batch)
+        if fast != normalize_arabic_reference(value) or normalize_arabic(value) != fast
+    ]
+
+def time_it(fn, values, repeat):
+    """Best-of-repeat wall time for normalizing all values."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(values)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fuzz", type=int, default=100000, help="Number of random strings to check")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    config = load_config()
+    corpus = load_corpus(config)
+    fuzz = fuzz_strings(args.fuzz)
+
+    print("🔎 Checking equivalence with the reference implementation...")
+    mismatches = check_equivalence(corpus + fuzz + [None, 3.5, 42, "", "   "])
+    if mismatches:
+        print(f"❌ {len(mismatches)} mismatches, e.g. {mismatches[:3]!r}")
+        sys.exit(1)
+    print(f"✅ Identical output on {len(corpus)} corpus cells and {len(fuzz)} fuzz strings")
+
+    texts = [value for value in corpus if isinstance(value, str)] or fuzz
+    reference = time_it(lambda vs: [normalize_arabic_reference(v) for v in vs], texts, args.repeat)
+    fast = time_it(normalize_arabic_batch, texts, args.repeat)
+    chars = sum(len(t) for t in texts)
+    print(f"📊 {len(texts)} texts, {chars} characters")
+    print(f"reference (6 x re.sub): {reference * 1000:8.1f} ms")
+    print(f"single pass:            {fast * 1000:8.1f} ms  ({reference / fast:.1f}x)")
+
+if __name__ == "__main__":
+    main()
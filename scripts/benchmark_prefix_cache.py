@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Measure prefill time of law-article prompts with and without the generator's
+prefix KV cache, and check that cached generation gives the same output
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import numpy as np
+
+from src.models.rag_model import LegalRAGModel, ARTICLE_PROMPT_PREFIX
+from src.utils.helpers import load_config, build_rag_config, read_table, setup_device
+
+def time_batches(generator, prompts, batch_size, repeat):
+    """Best-of-repeat time for a one-token generate_batch over all prompts (prefill dominated)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        generator.generate_batch(prompts, max_new_tokens=1, batch_size=batch_size)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-path", default="models/trained/finetuned_aragpt")
+    parser.add_argument("--limit", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=lambda v: [int(x) for x in v.split(",")], default=[1, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", type=int, default=8, help="Prompts generated in full to compare outputs")
+    parser.add_argument("--output", default="results/prefix_cache.json")
+    args = parser.parse_args()
+
+    config = load_config()
+    config['generation']['prefix_cache'] = False
+    config['answer_cache'] = {'enabled': False}
+    rag_model = LegalRAGModel(build_rag_config(config, args.model_path, setup_device()))
+    rag_model.load_models(
+        config['index']['index_path'],
+        config['index']['mapping_path'],
+        config['index']['chunk_text_path']
+    )
+    generator = rag_model.generator
+
+    questions = read_table(config['data']['cleaned_qa_path'], columns=['question'])['question'].tolist()
+    prepared = rag_model.prepare_prompts(generator.law_article_questions(questions)[:args.limit])
+    prompts = [item.prompt for item in prepared if not isinstance(item, str)]
+    max_tokens = [item.max_tokens for item in prepared if not isinstance(item, str)]
+
+    generator.register_prefix("law_article", ARTICLE_PROMPT_PREFIX)
+    prefix_len = generator.prefix_length("law_article")
+    token_ids = generator.tokenize(prompts, truncation=True)["input_ids"]
+    matched = sum(generator.match_prefix(p, ids) is not None for p, ids in zip(prompts, token_ids))
+    prompt_len = np.mean([len(ids) for ids in token_ids])
+    print(f"📊 {len(prompts)} article prompts, mean {prompt_len:.0f} tokens, cached prefix {prefix_len} tokens, "
+          f"{matched} prompts match the prefix")
+
+    results = []
+    for batch_size in args.batch_sizes:
+        generator.use_prefix_cache = False
+        baseline = time_batches(generator, prompts, batch_size, args.repeat)
+        generator.use_prefix_cache = True
+        cached = time_batches(generator, prompts, batch_size, args.repeat)
+        results.append({
+            "batch_size": batch_size,
+            "baseline_ms_per_prompt": baseline / len(prompts) * 1000,
+            "cached_ms_per_prompt": cached / len(prompts) * 1000,
+            "speedup": baseline / cached
+        })
+        print(f"batch {batch_size:>3}: {results[-1]['baseline_ms_per_prompt']:8.2f} ms -> "
+              f"{results[-1]['cached_ms_per_prompt']:8.2f} ms per prompt ({baseline / cached:.2f}x)")
+
+    check = prompts[:args.check]
+    generator.use_prefix_cache = False
+    expected = generator.generate_batch(check, max_new_tokens=max(max_tokens[:args.check], default=1))
+    generator.use_prefix_cache = True
+    actual = generator.generate_batch(check, max_new_tokens=max(max_tokens[:args.check], default=1))
+    identical = sum(a == b for a, b in zip(actual, expected))
+    print(f"{'✅' if identical == len(check) else '❌'} {identical}/{len(check)} outputs identical with the prefix cache")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "prompts": len(prompts), "mean_prompt_tokens": float(prompt_len), "prefix_tokens": prefix_len,
+            "matched": matched, "identical": identical, "checked": len(check), "results": results
+        }, f, indent=2)
+    print(f"✅ Prefix cache results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
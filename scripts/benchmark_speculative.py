@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Measure assisted (draft-model) decoding on QA prompts: draft acceptance rate,
+speedup over plain greedy decoding, and that both produce identical output
+(4-beam search is timed as the current baseline)
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import numpy as np
+import torch
+
+from src.models.rag_model import LegalRAGModel
+from src.utils.helpers import load_config, build_rag_config, read_table, setup_device
+
+def decode_ids(generator, prompt, mode, max_new_tokens):
+    """Generated token ids (prompt excluded) and wall time for one prompt."""
+    generator.decoding = mode
+    inputs = generator.tokenize(prompt, return_tensors="pt", truncation=True).to(generator.model.device)
+    start = time.perf_counter()
+    with torch.no_grad():
+        output = generator.model.generate(**inputs, **generator._generation_kwargs(max_new_tokens))
+    elapsed = time.perf_counter() - start
+    return inputs["input_ids"][0], output[0, inputs["input_ids"].shape[1]:], elapsed
+
+def draft_agreement(draft_model, prompt_ids, generated_ids):
+    """Fraction of generated positions where the draft's argmax equals the main model's token."""
+    if len(generated_ids) == 0:
+        return 0, 0
+    sequence = torch.cat([prompt_ids, generated_ids]).unsqueeze(0)
+    with torch.no_grad():
+        logits = draft_model(sequence).logits[0]
+    predictions = logits[len(prompt_ids) - 1:-1].argmax(dim=-1)
+    return int((predictions == generated_ids).sum()), len(generated_ids)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-path", default="models/trained/finetuned_aragpt")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--skip-beam", action="store_true")
+    parser.add_argument("--output", default="results/speculative_decoding.json")
+    args = parser.parse_args()
+
+    config = load_config()
+    config['generation']['decoding'] = "greedy"
+    config['answer_cache'] = {'enabled': False}
+    rag_model = LegalRAGModel(build_rag_config(config, args.model_path, setup_device()))
+    rag_model.load_models(
+        config['index']['index_path'],
+        config['index']['mapping_path'],
+        config['index']['chunk_text_path']
+    )
+    generator = rag_model.generator
+
+    questions = read_table(config['data']['cleaned_qa_path'], columns=['question'])['question'].tolist()
+    prepared = [item for item in rag_model.prepare_prompts(questions[:args.limit]) if not isinstance(item, str)]
+    print(f"📊 {len(prepared)} QA prompts, draft: {generator.draft_model_path}")
+
+    # Warm-up both models
+    decode_ids(generator, prepared[0].prompt, "assisted", 8)
+
+    rows = []
+    for item in prepared:
+        prompt, max_tokens = item.prompt, item.max_tokens
+        prompt_ids, greedy_ids, greedy_time = decode_ids(generator, prompt, "greedy", max_tokens)
+        _, assisted_ids, assisted_time = decode_ids(generator, prompt, "assisted", max_tokens)
+        beam_time = None if args.skip_beam else decode_ids(generator, prompt, "beam", max_tokens)[2]
+        accepted, total = draft_agreement(generator.draft_model, prompt_ids, greedy_ids)
+        rows.append({
+            "tokens": len(greedy_ids),
+            "identical": torch.equal(greedy_ids, assisted_ids),
+            "greedy_s": greedy_time,
+            "assisted_s": assisted_time,
+            "beam_s": beam_time,
+            "accepted": accepted,
+            "total": total
+        })
+
+    greedy = sum(r['greedy_s'] for r in rows)
+    assisted = sum(r['assisted_s'] for r in rows)
+    tokens = sum(r['tokens'] for r in rows)
+    summary = {
+        "prompts": len(rows),
+        "identical_outputs": sum(r['identical'] for r in rows),
+        "acceptance_rate": sum(r['accepted'] for r in rows) / max(sum(r['total'] for r in rows), 1),
+        "greedy_tokens_per_s": tokens / greedy,
+        "assisted_tokens_per_s": tokens / assisted,
+        "speedup_vs_greedy": greedy / assisted,
+        "assisted_p50_s": float(np.percentile([r['assisted_s'] for r in rows], 50)),
+        "greedy_p50_s": float(np.percentile([r['greedy_s'] for r in rows], 50))
+    }
+    if not args.skip_beam:
+        summary["speedup_vs_beam"] = sum(r['beam_s'] for r in rows) / assisted
+
+    for key, value in summary.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+    if summary["identical_outputs"] != summary["prompts"]:
+        print("❌ Assisted decoding changed the greedy output for some prompts")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "prompts": rows}, f, indent=2)
+    print(f"✅ Speculative decoding results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
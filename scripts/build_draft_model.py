@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Build a small draft model for assisted decoding by keeping evenly spaced
+transformer layers of the fine-tuned AraGPT2, optionally fine-tuning it on
+the QA set so its next-token choices track the main model more closely
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import numpy as np
+from torch import nn
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from src.training.trainer import LegalModelTrainer
+from src.utils.helpers import load_config
+
+def truncate_layers(model, num_layers):
+    """Keep num_layers evenly spaced blocks (always the first and the last)."""
+    blocks = model.transformer.h
+    keep = np.unique(np.linspace(0, len(blocks) - 1, num_layers).round().astype(int)).tolist()
+    model.transformer.h = nn.ModuleList([blocks[i] for i in keep])
+    model.config.n_layer = len(keep)
+    return model, keep
+
+def main():
+    config = load_config()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-path", default="models/trained/finetuned_aragpt")
+    parser.add_argument("--output", default=config['generation'].get('draft_model_path', "models/trained/draft_aragpt"))
+    parser.add_argument("--num-layers", type=int, default=4)
+    parser.add_argument("--epochs", type=int, default=0, help="Fine-tune the truncated model on the QA set (0 = skip)")
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path)
+    model = AutoModelForCausalLM.from_pretrained(args.model_path)
+    total_layers = model.config.n_layer
+    model, keep = truncate_layers(model, args.num_layers)
+    print(f"✂️ Kept layers {keep} of {total_layers}")
+
+    model.save_pretrained(args.output)
+    tokenizer.save_pretrained(args.output)
+
+    if args.epochs:
+        print("🚀 Fine-tuning the draft model...")
+        trainer = LegalModelTrainer(model_name=args.output, output_dir=args.output + "_training")
+        dataset = trainer.prepare_dataset(config['data']['cleaned_qa_path'])
+        tokenized_dataset = trainer.tokenize_dataset(dataset, max_length=config['training']['max_length'])
+        trainer.train(
+            dataset=tokenized_dataset,
+            batch_size=config['training']['batch_size'],
+            epochs=args.epochs
+        )
+        trainer.save_model(args.output)
+
+    params = sum(p.numel() for p in AutoModelForCausalLM.from_pretrained(args.output).parameters())
+    print(f"✅ Draft model ({params / 1e6:.1f}M parameters) saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,23 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from transformers import AutoTokenizer
+
 from src.data_processing.preprocessor import LegalDataPreprocessor
 from src.data_processing.chunker import DocumentChunker
+from src.models.article_index import ArticleIndex
+from src.models.chunk_store import count_tokens, save_token_counts
 from src.models.embeddings import EmbeddingModel
+from src.models.embedding_cache import EmbeddingStore
 from src.models.vector_store import VectorStore
-from src.utils.helpers import load_config, setup_device, create_directories
+from src.models.lexical_index import BM25Index
+from src.utils.helpers import load_config, setup_device, create_directories, write_table
+
+def excel_export_path(path, config):
+    """Excel copy of a cleaned table, only when data.export_excel is enabled."""
+    if not config['data'].get('export_excel'):
+        return None
+    return os.path.splitext(path)[0] + ".xlsx"
 
 def main():
     # Load configuration and setup
@@ -22,49 +34,88 @@ def main():
     # Clean legal data
     preprocessor.clean_legal_data(
         config['data']['legal_data_path'],
-        config['data']['cleaned_legal_path']
+        config['data']['cleaned_legal_path'],
+        export_path=excel_export_path(config['data']['cleaned_legal_path'], config)
     )
     
     # Clean QA data
     preprocessor.clean_qa_data(
         config['data']['qa_data_path'],
-        config['data']['cleaned_qa_path']
+        config['data']['cleaned_qa_path'],
+        export_path=excel_export_path(config['data']['cleaned_qa_path'], config)
     )
     
     print("📝 Creating embeddings...")
     # Initialize embedding model
-    embedding_model = EmbeddingModel(config['model']['embedding_model'], device)
+    embedding_model = EmbeddingModel(
+        config['model']['embedding_model'], device,
+        backend=config['embedding'].get('backend', 'torch'),
+        backend_path=config['embedding'].get('backend_path')
+    )
     
     # Initialize chunker
     chunker = DocumentChunker(
         embedding_model.tokenizer,
         chunk_size=config['chunking']['chunk_size'],
-        chunk_overlap=config['chunking']['chunk_overlap']
+        chunk_overlap=config['chunking']['chunk_overlap'],
+        engine=config['chunking'].get('engine', 'langchain'),
+        num_workers=config['chunking'].get('num_workers', 1)
     )
     
     # Chunk data
-    df_chunked = chunker.chunk_legal_data(config['data']['cleaned_legal_path'])
+    df_chunked = chunker.chunk_legal_data(config['data']['cleaned_legal_path'], normalize=False)
     chunks, mapping = chunker.flatten_chunks(df_chunked)
     
     print(f"📊 Created {len(chunks)} chunks from legal data")
+    write_table(chunker.to_chunk_table(chunks, mapping), config['data']['chunks_path'])
     
-    # Create embeddings
+    # Create embeddings, reusing cached vectors for unchanged chunks
+    method = config['retrieval']['embedding_method']
+    store = EmbeddingStore(config['embedding']['cache_dir'])
     embeddings = embedding_model.embed_texts(
         chunks, 
-        method=config['retrieval']['embedding_method']
+        method=method,
+        store=store,
+        max_tokens_per_batch=config['embedding'].get('max_tokens_per_batch')
     )
+    store.save(keep_keys=[
+        EmbeddingStore.make_key(chunk, embedding_model.encoder_id, method) for chunk in chunks
+    ])
     
     print("💾 Building and saving FAISS index...")
     # Build and save index
     vector_store = VectorStore()
     vector_store.build_faiss_index(
         embeddings=embeddings,
-        index_path="data/processed/legal_faiss.index",
-        mapping_path="data/processed/legal_chunk_mapping.pkl",
+        index_path=config['index']['index_path'],
+        mapping_path=config['index']['mapping_path'],
         mapping_list=mapping,
-        chunk_texts=chunks
+        chunk_texts=chunks,
+        chunk_text_path=config['index']['chunk_text_path'],
+        index_config=config['index']
     )
     
+    print("🔢 Counting generator tokens per chunk...")
+    # Count with the tokenizer used for prompt packing (the fine-tuned generator's, once trained)
+    tokenizer_name = config['index'].get('token_counts_tokenizer')
+    if not tokenizer_name or not os.path.exists(tokenizer_name):
+        tokenizer_name = config['model']['generator_model']
+    generator_tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    save_token_counts(
+        count_tokens(generator_tokenizer, chunks), config['index']['token_counts_path'],
+        generator_tokenizer, tokenizer_name
+    )
+    print(f"✅ Saved chunk token counts ({tokenizer_name}) to: {config['index']['token_counts_path']}")
+    
+    print("🔤 Building BM25 lexical index...")
+    BM25Index().build(chunks).save(config['index']['lexical_index_path'])
+    print(f"✅ Saved BM25 index to: {config['index']['lexical_index_path']}")
+    
+    print("⚖️ Building law-article index...")
+    article_index = ArticleIndex().build(chunks)
+    article_index.save(config['index']['article_index_path'])
+    print(f"✅ Saved article index ({len(article_index)} law articles) to: {config['index']['article_index_path']}")
+    
     print("✅ Index building completed successfully!")
 
 if __name__ == "__main__":
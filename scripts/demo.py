@@ -7,7 +7,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.models.rag_model import LegalRAGModel
-from src.utils.helpers import load_config, setup_device
+from src.utils.helpers import load_config, setup_device, build_rag_config
 
 def main():
     # Load configuration
@@ -15,18 +15,14 @@ def main():
     device = setup_device()
     
     # Initialize RAG model
-    rag_config = {
-        'embedding_model': config['model']['embedding_model'],
-        'generator_model_path': "models/trained/finetuned_aragpt",
-        'device': device
-    }
+    rag_config = build_rag_config(config, "models/trained/finetuned_aragpt", device)
     
     print("🤖 Loading RAG model...")
     rag_model = LegalRAGModel(rag_config)
     rag_model.load_models(
-        "data/processed/legal_faiss.index",
-        "data/processed/legal_chunk_mapping.pkl",
-        "data/processed/legal_chunk_texts.pkl"
+        config['index']['index_path'],
+        config['index']['mapping_path'],
+        config['index']['chunk_text_path']
     )
     
     # Example questions
@@ -39,9 +35,9 @@ def main():
     print("📝 Testing RAG model with example questions:")
     print("="*60)
     
-    for i, question in enumerate(questions, 1):
+    answers = rag_model.generate_answers(questions)
+    for i, (question, answer) in enumerate(zip(questions, answers), 1):
         print(f"\n🧾 Question {i}: {question}")
-        answer = rag_model.generate_answer(question)
         print(f"📜 Answer: {answer}")
         print("-"*60)
 
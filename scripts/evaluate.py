@@ -3,10 +3,9 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pandas as pd
 from src.models.rag_model import LegalRAGModel
 from src.evaluation.evaluator import RAGEvaluator
-from src.utils.helpers import load_config, setup_device
+from src.utils.helpers import load_config, setup_device, build_rag_config, read_table
 
 def main():
     # Load configuration
@@ -14,20 +13,16 @@ def main():
     device = setup_device()
     
     # Load QA data
-    qa_df = pd.read_excel(config['data']['cleaned_qa_path'])
+    qa_df = read_table(config['data']['cleaned_qa_path'], columns=['question', 'answer', 'case_id'])
     
     # Initialize RAG model
-    rag_config = {
-        'embedding_model': config['model']['embedding_model'],
-        'generator_model_path': "models/trained/finetuned_aragpt",
-        'device': device
-    }
+    rag_config = build_rag_config(config, "models/trained/finetuned_aragpt", device)
     
     rag_model = LegalRAGModel(rag_config)
     rag_model.load_models(
-        "data/processed/legal_faiss.index",
-        "data/processed/legal_chunk_mapping.pkl",
-        "data/processed/legal_chunk_texts.pkl"
+        config['index']['index_path'],
+        config['index']['mapping_path'],
+        config['index']['chunk_text_path']
     )
     
     # Initialize evaluator
@@ -44,12 +39,15 @@ def main():
     
     print("📝 Evaluating Generator...")
     # Evaluate generator
-    generation_metrics = evaluator.evaluate_generator(qa_df, rag_model)
+    generation_metrics = evaluator.evaluate_generator(
+        qa_df, rag_model, batch_size=config['generation'].get('batch_size', 8)
+    )
     
     # Save results
     import json
     results = {
         'retrieval_metrics': retrieval_metrics,
+        'first_relevant_ranks': evaluator.first_relevant_ranks.tolist(),
         'generation_metrics': {
             'BLEU': generation_metrics['BLEU'],
             'BERTScore_F1': generation_metrics['BERTScore_F1']
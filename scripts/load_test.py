@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Load-test the RAG inference server: throughput and p50/p95/p99 latency at
+several concurrency levels, using the QA questions as the request stream
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from src.serving.client import RAGClient
+from src.utils.helpers import load_config, read_table
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v]
+
+async def post_answer(reader, writer, host, question):
+    """Send one keep-alive POST /answer and return the status code."""
+    body = json.dumps({"question": question}).encode("utf-8")
+    writer.write(
+        f"POST /answer HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+async def run_level(url, questions, concurrency, num_requests):
+    """Run num_requests requests with `concurrency` closed-loop clients."""
+    parsed = urlparse(url)
+    next_request = iter(range(num_requests))
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(parsed.hostname, parsed.port or 80)
+        try:
+            for i in next_request:
+                start = time.perf_counter()
+                status = await post_answer(reader, writer, parsed.netloc, questions[i % len(questions)])
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        **{f"p{p}_s": float(np.percentile(latencies, p)) for p in (50, 95, 99)}
+    }
+
+def main():
+    config = load_config()
+    serving = config.get('serving', {})
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=serving.get('url') or f"http://localhost:{serving.get('port', 8000)}")
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--output", default="results/load_test.json")
+    args = parser.parse_args()
+
+    questions = read_table(config['data']['cleaned_qa_path'], columns=['question'])['question'].tolist()
+    client = RAGClient(args.url)
+    client.health()
+    print(f"📊 {args.url}: {len(questions)} QA questions, {args.requests} requests per level")
+
+    results = []
+    print(f"{'clients':>8} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'errors':>7}")
+    for concurrency in args.concurrency:
+        result = asyncio.run(run_level(args.url, questions, concurrency, args.requests))
+        result["server"] = client.metrics()
+        results.append(result)
+        print(f"{concurrency:>8} {result['throughput_rps']:8.2f} {result['p50_s']:8.3f} "
+              f"{result['p95_s']:8.3f} {result['p99_s']:8.3f} {result['errors']:>7}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"url": args.url, "results": results}, f, indent=2)
+    print(f"✅ Load test results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Run the micro-batching RAG inference server
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+
+from src.models.rag_model import LegalRAGModel
+from src.serving.server import RAGServer
+from src.utils.helpers import load_config, build_rag_config, setup_device
+
+def main():
+    config = load_config()
+    serving = config.get('serving', {})
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=serving.get('host', "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=serving.get('port', 8000))
+    parser.add_argument("--max-batch-size", type=int, default=serving.get('max_batch_size', 16))
+    parser.add_argument("--max-wait-ms", type=float, default=serving.get('max_wait_ms', 20))
+    parser.add_argument("--model-path", default="finetuned_aragpt")
+    args = parser.parse_args()
+
+    print("🚀 Loading RAG model...")
+    rag_model = LegalRAGModel(build_rag_config(config, args.model_path, setup_device()))
+    rag_model.load_models(
+        config['index']['index_path'],
+        config['index']['mapping_path'],
+        config['index']['chunk_text_path']
+    )
+
+    server = RAGServer(
+        rag_model,
+        top_k=serving.get('top_k', 3),
+        threshold=serving.get('threshold', 0.6),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        generation_batch_size=config['generation'].get('batch_size', 8)
+    )
+    server.run(args.host, args.port)
+
+if __name__ == "__main__":
+    main()
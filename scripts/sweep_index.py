@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Sweep FAISS index settings and report recall@k against the exact flat index,
+single-query p50/p99 latency and index memory, to pick an ANN / compression
+operating point
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import faiss
+import numpy as np
+
+from src.models.chunk_store import ChunkTextStore
+from src.models.embedding_cache import EmbeddingStore, encoder_id
+from src.models.vector_store import VectorStore
+from src.utils.helpers import load_config, read_table, setup_device
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v]
+
+def load_corpus_vectors(config):
+    """Chunk vectors from the embedding cache, falling back to a flat index on disk."""
+    method = config['retrieval']['embedding_method']
+    store = EmbeddingStore(config['embedding']['cache_dir'])
+    texts = ChunkTextStore(config['index']['chunk_text_path'])
+    model_id = encoder_id(config['model']['embedding_model'], config['embedding'].get('backend', 'torch'))
+    keys = [EmbeddingStore.make_key(text, model_id, method) for text in texts]
+    if keys and all(key in store for key in keys):
+        return store.get_many(keys)
+
+    index = faiss.read_index(config['index']['index_path'])
+    if not isinstance(index, faiss.IndexFlat):
+        raise ValueError("Embedding cache incomplete and the saved index is not flat; rebuild with build_index.py")
+    return index.reconstruct_n(0, index.ntotal)
+
+def load_queries(config, args, corpus):
+    """Embed the QA questions, or perturb corpus vectors with --synthetic-queries."""
+    if args.synthetic_queries:
+        rng = np.random.default_rng(0)
+        picks = corpus[rng.choice(len(corpus), args.synthetic_queries, replace=True)]
+        queries = picks + rng.normal(scale=0.02, size=picks.shape).astype("float32")
+        return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    from src.models.embeddings import EmbeddingModel
+    qa_df = read_table(config['data']['cleaned_qa_path'], columns=['question'])
+    model = EmbeddingModel(config['model']['embedding_model'], setup_device())
+    return model.embed_queries(qa_df['question'].tolist(), method=config['retrieval']['embedding_method'])
+
+def sweep_settings(args):
+    """Expand the CLI grids into index configs."""
+    settings = []
+    for storage in args.storage:
+        settings.append({'type': 'flat', 'storage': storage})
+        for nlist in args.nlist:
+            for nprobe in args.nprobe:
+                settings.append({'type': 'ivf_flat', 'nlist': nlist, 'nprobe': nprobe, 'storage': storage})
+        for hnsw_m in args.hnsw_m:
+            for ef_search in args.ef_search:
+                settings.append({'type': 'hnsw', 'hnsw_m': hnsw_m, 'ef_search': ef_search,
+                                 'ef_construction': 200, 'storage': storage})
+    for nlist in args.nlist:
+        for nprobe in args.nprobe:
+            for pq_m in args.pq_m:
+                settings.append({'type': 'ivf_pq', 'nlist': nlist, 'nprobe': nprobe, 'pq_m': pq_m, 'pq_nbits': 8})
+
+    # Compressed settings are also measured with float32 re-scoring of the candidates
+    if args.rescore_factor:
+        settings += [
+            {**setting, 'rescore_factor': args.rescore_factor} for setting in list(settings)
+            if setting.get('storage', 'float32') != 'float32' or setting['type'] == 'ivf_pq'
+        ]
+    return settings
+
+def measure(index, queries, exact_ids, k, corpus=None, rescore_factor=0):
+    """Recall@k against exact neighbours and per-query latency percentiles (ms)."""
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        if rescore_factor:
+            _, candidates = index.search(query[None, :], k * rescore_factor)
+            _, I = VectorStore.rescore(query[None, :], candidates, corpus, k)
+        else:
+            _, I = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(I[0])
+
+    found = np.vstack(found)
+    recall = np.mean([
+        len(np.intersect1d(row, exact_row)) / k for row, exact_row in zip(found, exact_ids)
+    ])
+    return recall, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=parse_ints, default=[256, 1024])
+    parser.add_argument("--nprobe", type=parse_ints, default=[1, 4, 16, 64])
+    parser.add_argument("--pq-m", type=parse_ints, default=[64])
+    parser.add_argument("--hnsw-m", type=parse_ints, default=[16, 32])
+    parser.add_argument("--ef-search", type=parse_ints, default=[16, 64, 256])
+    parser.add_argument("--storage", type=lambda v: v.split(","), default=["float32", "fp16", "int8"])
+    parser.add_argument("--rescore-factor", type=int, default=4,
+                        help="Also measure compressed settings re-scored against float32 vectors (0 disables)")
+    parser.add_argument("--synthetic-queries", type=int, default=0)
+    parser.add_argument("--output", default="results/index_sweep.json")
+    args = parser.parse_args()
+
+    config = load_config()
+    corpus = np.ascontiguousarray(load_corpus_vectors(config), dtype="float32")
+    queries = np.ascontiguousarray(load_queries(config, args, corpus), dtype="float32")
+    print(f"📊 {len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    exact = faiss.IndexFlatIP(corpus.shape[1])
+    exact.add(corpus)
+    _, exact_ids = exact.search(queries, args.k)
+
+    flat_bytes = faiss.serialize_index(exact).nbytes
+    results = []
+    print(f"{'setting':<72} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'MB':>8} {'saved':>6}")
+    for setting in sweep_settings(args):
+        start = time.perf_counter()
+        index = VectorStore.create_index(corpus, setting)
+        build_time = time.perf_counter() - start
+        index_bytes = faiss.serialize_index(index).nbytes
+
+        recall, p50, p99 = measure(
+            index, queries, exact_ids, args.k,
+            corpus=corpus, rescore_factor=setting.get('rescore_factor', 0)
+        )
+        saved = 1 - index_bytes / flat_bytes
+        name = ", ".join(f"{key}={value}" for key, value in setting.items())
+        print(f"{name:<72} {recall:7.4f} {p50:8.3f} {p99:8.3f} {build_time:8.1f} "
+              f"{index_bytes / 2**20:8.1f} {saved:6.1%}")
+        results.append({**setting, "recall@k": recall, "p50_ms": p50, "p99_ms": p99, "build_s": build_time,
+                        "index_bytes": index_bytes, "memory_saved": saved})
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"k": args.k, "results": results}, f, indent=2)
+    print(f"✅ Sweep results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
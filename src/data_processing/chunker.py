@@ -1,47 +1,72 @@
 import pandas as pd
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from src.utils.helpers import normalize_arabic
+from src.data_processing.token_splitter import TokenOffsetSplitter, DEFAULT_SEPARATORS
+from src.utils.helpers import normalize_arabic_batch, read_table
 
 class DocumentChunker:
-    def __init__(self, tokenizer, chunk_size=300, chunk_overlap=50):
+    def __init__(self, tokenizer, chunk_size=300, chunk_overlap=50, engine="langchain", num_workers=1):
         self.tokenizer = tokenizer
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-    
-    def chunk_legal_data(self, input_path):
-        """Load legal data, apply normalization, and split into overlapping chunks."""
-        df = pd.read_excel(input_path)
-        
+        self.engine = engine
+        self.num_workers = num_workers
+
+    @staticmethod
+    def combine_row(row):
+        """Join the text fields of a case into a single document."""
+        return " - ".join([
+            str(row[c]) for c in ['Title', 'Keywords', 'Description']
+            if c in row and pd.notnull(row[c])
+        ])
+
+    def chunk_legal_data(self, input_path, normalize=True):
+        """Load legal data, apply normalization, and split into overlapping chunks.
+
+        Pass normalize=False when input_path is already cleaned by LegalDataPreprocessor.
+        """
+        df = read_table(input_path, columns=['Case ID', 'Title', 'Keywords', 'Description'])
+
         # Normalize data
-        for col in ['Case ID', 'Title', 'Keywords', 'Description']:
-            if col in df.columns:
-                df[col] = df[col].apply(normalize_arabic)
-        
+        if normalize:
+            for col in ['Case ID', 'Title', 'Keywords', 'Description']:
+                if col in df.columns:
+                    df[col] = normalize_arabic_batch(df[col])
+
+        if self.engine == "fast":
+            splitter = TokenOffsetSplitter(self.tokenizer, self.chunk_size, self.chunk_overlap)
+            documents = [self.combine_row(row) for _, row in df.iterrows()]
+            chunks = splitter.split_texts_parallel(documents, num_workers=self.num_workers)
+            df['case_chunks'] = pd.Series(chunks, index=df.index, dtype=object)
+            return df
+
         def chunk_row(row):
-            combined = " - ".join([
-                str(row[c]) for c in ['Title', 'Keywords', 'Description']
-                if c in row and pd.notnull(row[c])
-            ])
-            
             splitter = RecursiveCharacterTextSplitter(
                 chunk_size=self.chunk_size,
                 chunk_overlap=self.chunk_overlap,
-                separators=["\n\n", "\n", ".", "؟", ":", "؛", "،", "-"],
+                separators=DEFAULT_SEPARATORS,
                 length_function=lambda text: len(self.tokenizer.tokenize(text))
             )
-            return splitter.split_text(combined)
-        
+            return splitter.split_text(self.combine_row(row))
+
         df['case_chunks'] = df.apply(chunk_row, axis=1)
         return df
-    
+
     def flatten_chunks(self, df):
         """Convert chunked DataFrame into list of texts and list of corresponding case IDs."""
         all_chunks, id_map = [], []
-        
+
         for _, row in df.iterrows():
             if isinstance(row['case_chunks'], list):
                 for chunk in row['case_chunks']:
                     all_chunks.append(chunk)
                     id_map.append(row['Case ID'])
-        
-        return all_chunks, id_map
\ No newline at end of file
+
+        return all_chunks, id_map
+
+    def to_chunk_table(self, chunks, id_map):
+        """Build the columnar chunk table (chunk_id, case_id, text) written by the build pipeline."""
+        return pd.DataFrame({
+            'chunk_id': range(len(chunks)),
+            'case_id': id_map,
+            'text': chunks
+        })
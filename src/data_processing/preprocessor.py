@@ -1,32 +1,30 @@
-import pandas as pd
-from src.utils.helpers import normalize_arabic
+from src.utils.helpers import normalize_arabic_batch, read_table, write_table
 
 class LegalDataPreprocessor:
     def __init__(self):
         pass
     
-    def clean_legal_data(self, input_path, output_path):
-        """Normalize columns of the legal data Excel and save cleaned version."""
-        df = pd.read_excel(input_path)
-        columns_to_clean = ['Case ID', 'Title', 'Keywords', 'Description']
+    def _clean(self, input_path, output_path, columns_to_clean, export_path=None):
+        """Normalize the given columns, save them in the pipeline format and optionally export to Excel."""
+        df = read_table(input_path)
         
         for col in columns_to_clean:
             if col in df.columns:
-                df[col] = df[col].apply(normalize_arabic)
+                df[col] = normalize_arabic_batch(df[col])
         
-        df.to_excel(output_path, index=False)
+        write_table(df, output_path)
+        if export_path:
+            write_table(df, export_path)
+        return df
+    
+    def clean_legal_data(self, input_path, output_path, export_path=None):
+        """Normalize columns of the legal data and save cleaned version."""
+        df = self._clean(input_path, output_path, ['Case ID', 'Title', 'Keywords', 'Description'], export_path)
         print(f"✅ Cleaned legal data saved to: {output_path}")
         return df
     
-    def clean_qa_data(self, input_path, output_path):
+    def clean_qa_data(self, input_path, output_path, export_path=None):
         """Normalize question, answer, and context in the QA dataset."""
-        df = pd.read_excel(input_path)
-        columns_to_clean = ['question', 'answer', 'context']
-        
-        for col in columns_to_clean:
-            if col in df.columns:
-                df[col] = df[col].apply(normalize_arabic)
-        
-        df.to_excel(output_path, index=False)
+        df = self._clean(input_path, output_path, ['question', 'answer', 'context'], export_path)
         print(f"✅ Cleaned QA data saved to: {output_path}")
-        return df
\ No newline at end of file
+        return df
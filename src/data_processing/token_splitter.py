@@ -0,0 +1,124 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ".", "؟", ":", "؛", "،", "-"]
+_NO_BOUNDARY = np.iinfo(np.int32).max
+
+_worker_splitter = None
+
+def _init_worker(tokenizer, chunk_size, chunk_overlap, separators):
+    """Create one splitter per worker process."""
+    global _worker_splitter
+    _worker_splitter = TokenOffsetSplitter(tokenizer, chunk_size, chunk_overlap, separators)
+
+def _split_shard(texts):
+    """Split a shard of texts inside a worker process."""
+    return _worker_splitter.split_texts(texts)
+
+class TokenOffsetSplitter:
+    """Token-budget text splitter that tokenizes each document exactly once.
+
+    Chunks hold at most chunk_size tokens and consecutive chunks overlap by at
+    most chunk_overlap tokens, as with RecursiveCharacterTextSplitter using a
+    token length function. Boundaries are placed on token offsets, preferring
+    the highest-priority separator available inside each window; like the
+    recursive splitter (keep_separator=True), a separator starts the next chunk.
+    """
+
+    def __init__(self, tokenizer, chunk_size=300, chunk_overlap=50, separators=None):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        # Alternation in priority order, so "\n\n" wins over "\n" at the same position
+        self.separator_pattern = re.compile("|".join(re.escape(sep) for sep in self.separators))
+        self.separator_rank = {sep: rank for rank, sep in enumerate(self.separators)}
+
+    def _boundary_ranks(self, text, starts, ends):
+        """Return, for every token index j, the best separator rank of a break before token j."""
+        n = len(starts)
+        ranks = np.full(n + 1, _NO_BOUNDARY, dtype=np.int32)
+
+        for match in self.separator_pattern.finditer(text):
+            pos = match.start()
+            j = int(np.searchsorted(starts, pos, side="left"))
+            # Only break between tokens, never inside one
+            if 0 < j < n and ends[j - 1] <= pos:
+                ranks[j] = min(ranks[j], self.separator_rank[match.group()])
+
+        return ranks
+
+    def _split_encoded(self, text, offsets):
+        """Place chunk boundaries for one document from its token offsets."""
+        if not offsets:
+            return [text.strip()] if text.strip() else []
+
+        offsets = np.asarray(offsets, dtype=np.int64)
+        starts, ends = offsets[:, 0], offsets[:, 1]
+        n = len(offsets)
+        ranks = self._boundary_ranks(text, starts, ends)
+
+        chunks = []
+        start, prev_end = 0, 0
+        while start < n:
+            limit = start + self.chunk_size
+            if limit >= n:
+                end = n
+            else:
+                # Every chunk must extend past the previous one, not just repeat the overlap
+                lo = max(start, prev_end) + 1
+                window = ranks[lo:limit + 1]
+                best = window.min()
+                if best == _NO_BOUNDARY:
+                    end = limit
+                else:
+                    # Last break of the best separator keeps the chunk as full as possible
+                    end = lo + int(np.flatnonzero(window == best)[-1])
+
+            chunk = text[starts[start]:ends[end - 1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= n:
+                break
+
+            # Overlap starts at the earliest break within the last chunk_overlap tokens
+            lo = max(end - self.chunk_overlap, start + 1)
+            candidates = np.flatnonzero(ranks[lo:end] != _NO_BOUNDARY)
+            start, prev_end = (lo + int(candidates[0]) if len(candidates) else end), end
+
+        return chunks
+
+    def split_text(self, text):
+        """Split one document into overlapping token-bounded chunks."""
+        return self.split_texts([text])[0]
+
+    def split_texts(self, texts):
+        """Split many documents with one batched tokenizer call."""
+        encoded = self.tokenizer(
+            list(texts), add_special_tokens=False, return_offsets_mapping=True
+        )
+        return [
+            self._split_encoded(text, offsets)
+            for text, offsets in zip(texts, encoded["offset_mapping"])
+        ]
+
+    def split_texts_parallel(self, texts, num_workers=4, shard_size=256):
+        """Shard documents across a process pool; results keep the input order."""
+        texts = list(texts)
+        if num_workers <= 1 or len(texts) <= shard_size:
+            return self.split_texts(texts)
+
+        shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_worker,
+            initargs=(self.tokenizer, self.chunk_size, self.chunk_overlap, self.separators)
+        ) as pool:
+            results = pool.map(_split_shard, shards)
+
+        return [chunks for shard in results for chunks in shard]
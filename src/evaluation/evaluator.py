@@ -1,3 +1,5 @@
+import multiprocessing as mp
+import os
 import pandas as pd
 from tqdm import tqdm
 import matplotlib.pyplot as plt
@@ -5,54 +7,133 @@ import numpy as np
 from bert_score import score
 import evaluate
 
+_WORKER_RETRIEVER = None
+
+def _init_worker():
+    """Forked worker setup: single-threaded torch and FAISS so no inherited OpenMP pool is entered."""
+    import faiss
+    import torch
+    torch.set_num_threads(1)
+    faiss.omp_set_num_threads(1)  # faiss-cpu ships its own libgomp
+
+def _retrieve_shard(args):
+    """Worker entry point: retrieve one shard of questions with the inherited retriever."""
+    questions, top_k, batch_size, group_by_case = args
+    return RAGEvaluator._retrieve_batches(questions, _WORKER_RETRIEVER, top_k, batch_size, group_by_case)
+
 class RAGEvaluator:
     def __init__(self):
         self.bleu = evaluate.load("sacrebleu")
     
-    def evaluate_retriever(self, qa_df, rag_model, k_values=[10, 20, 50]):
-        """Evaluate retriever performance."""
-        all_metrics = {}
+    def evaluate_retriever(self, qa_df, rag_model, k_values=[10, 20, 50], batch_size=32, num_workers=1,
+                           group_by_case=None):
+        """Evaluate retriever performance.
+
+        Questions are retrieved once at max(k_values); every k is then scored
+        from the same rank matrix, and the per-question first relevant ranks
+        are kept on self.first_relevant_ranks. group_by_case overrides the
+        retriever's case-aware search setting.
+        """
+        questions = qa_df["question"].tolist()
+        true_case_ids = np.asarray(qa_df["case_id"].tolist(), dtype=object)
+        max_k = max(k_values)
         
-        for k in k_values:
-            print(f"\n🔍 Evaluating @ top-{k}")
-            recall, mrr, hits = 0, 0, 0
-            total = len(qa_df)
-            
-            for _, row in tqdm(qa_df.iterrows(), total=total):
-                question = row["question"]
-                true_case_id = row["case_id"]
-                
-                # Get retrieval results
-                results, _ = rag_model.retriever.retrieve(question, top_k=k)
-                retrieved_ids = [result[2] for result in results]  # case_id is at index 2
-                
-                relevant_found = [cid == true_case_id for cid in retrieved_ids]
-                
-                if any(relevant_found):
-                    recall += 1
-                    hits += 1
-                    rank = relevant_found.index(True) + 1
-                    mrr += 1 / rank
-            
-            metrics = {
-                "Recall@k": recall / total,
-                "MRR@k": mrr / total,
-                "Hit@k": hits / total
-            }
-            
-            all_metrics[k] = metrics
+        print(f"\n🔍 Retrieving top-{max_k} for {len(questions)} questions")
+        if num_workers > 1:
+            _, chunk_ids, case_ids = self._retrieve_parallel(
+                questions, rag_model, max_k, batch_size, num_workers, group_by_case
+            )
+        else:
+            _, chunk_ids, case_ids = self._retrieve_batches(
+                questions, rag_model.retriever, max_k, batch_size, group_by_case
+            )
+        
+        self.first_relevant_ranks = self.first_relevant_rank(chunk_ids, case_ids, true_case_ids)
+        all_metrics = self.metrics_from_ranks(self.first_relevant_ranks, k_values)
+        
+        for k, metrics in all_metrics.items():
+            print(f"\n📊 Evaluation @ top-{k}")
             for key, value in metrics.items():
                 print(f"{key}: {value:.4f}")
         
         return all_metrics
     
-    def evaluate_generator(self, qa_df, rag_model):
+    @staticmethod
+    def _retrieve_batches(questions, retriever, top_k, batch_size, group_by_case=None):
+        """Run batched retrieval over a list of questions and stack the results."""
+        scores, chunk_ids, case_ids = [], [], []
+        for i in tqdm(range(0, len(questions), batch_size), desc="Retrieving"):
+            D, I, C = retriever.retrieve_batch(
+                questions[i:i+batch_size], top_k=top_k, batch_size=batch_size, group_by_case=group_by_case
+            )
+            scores.append(D)
+            chunk_ids.append(I)
+            case_ids.append(C)
+        return np.vstack(scores), np.vstack(chunk_ids), np.vstack(case_ids)
+    
+    def _retrieve_parallel(self, questions, rag_model, top_k, batch_size, num_workers, group_by_case=None):
+        """Split the questions across forked worker processes sharing the loaded retriever.
+
+        Forking after torch and the tokenizers have started thread pools can
+        deadlock the children, so the parent drops to one torch and one FAISS
+        thread and disables tokenizers parallelism before forking, and each
+        worker stays single-threaded.
+        """
+        import faiss
+        import torch
+        global _WORKER_RETRIEVER
+        _WORKER_RETRIEVER = rag_model.retriever
+        
+        shards = [shard.tolist() for shard in np.array_split(np.asarray(questions, dtype=object), num_workers)]
+        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+        num_threads = torch.get_num_threads()
+        faiss_threads = faiss.omp_get_max_threads()
+        torch.set_num_threads(1)
+        faiss.omp_set_num_threads(1)
+        try:
+            ctx = mp.get_context("fork")
+            with ctx.Pool(num_workers, initializer=_init_worker) as pool:
+                parts = pool.map(_retrieve_shard, [(shard, top_k, batch_size, group_by_case) for shard in shards if shard])
+        finally:
+            torch.set_num_threads(num_threads)
+            faiss.omp_set_num_threads(faiss_threads)
+        
+        return tuple(np.vstack([part[j] for part in parts]) for j in range(3))
+    
+    @staticmethod
+    def first_relevant_rank(chunk_ids, case_ids, true_case_ids):
+        """Return the 1-based rank of the first relevant hit per question (0 if none)."""
+        relevant = (case_ids == true_case_ids[:, None]) & (chunk_ids >= 0)
+        found = relevant.any(axis=1)
+        return np.where(found, relevant.argmax(axis=1) + 1, 0)
+    
+    @staticmethod
+    def metrics_from_ranks(ranks, k_values):
+        """Compute Recall/MRR/Hit for every k from first relevant ranks."""
+        ranks = np.asarray(ranks)
+        total = len(ranks)
+        reciprocal = np.divide(1.0, ranks, out=np.zeros(total), where=ranks > 0)
+        
+        all_metrics = {}
+        for k in k_values:
+            hit = (ranks > 0) & (ranks <= k)
+            all_metrics[k] = {
+                "Recall@k": float(hit.sum() / total),
+                "MRR@k": float(np.where(hit, reciprocal, 0).sum() / total),
+                "Hit@k": float(hit.sum() / total)
+            }
+        return all_metrics
+    
+    def evaluate_generator(self, qa_df, rag_model, batch_size=8):
         """Evaluate generator performance."""
-        # Generate answers
+        # Generate answers in batches
+        questions = qa_df['question'].tolist()
         generated_answers = []
-        for question in tqdm(qa_df['question'], desc="Generating answers"):
-            answer = rag_model.generate_answer(question)
-            generated_answers.append(answer)
+        chunk_size = batch_size * 8
+        for i in tqdm(range(0, len(questions), chunk_size), desc="Generating answers"):
+            generated_answers.extend(
+                rag_model.generate_answers(questions[i:i+chunk_size], batch_size=batch_size)
+            )
         
         refs = qa_df['answer'].tolist()
         preds = generated_answers
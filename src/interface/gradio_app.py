@@ -4,7 +4,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.models.rag_model import LegalRAGModel
-from src.utils.helpers import load_config
+from src.serving.client import RAGClient
+from src.utils.helpers import load_config, build_rag_config
 
 class GradioInterface:
     def __init__(self):
@@ -12,24 +13,32 @@ class GradioInterface:
         self.rag_model = self._load_model()
     
     def _load_model(self):
-        """Load the RAG model."""
-        config = {
-            'embedding_model': self.config['model']['embedding_model'],
-            'generator_model_path': "finetuned_aragpt",
-            'device': self.config['model']['device']
-        }
+        """Load the RAG model, or connect to the inference server if one is configured."""
+        server_url = self.config.get('serving', {}).get('url')
+        if server_url:
+            return RAGClient(server_url)
+        
+        config = build_rag_config(
+            self.config, "finetuned_aragpt", self.config['model']['device']
+        )
         
         model = LegalRAGModel(config)
         model.load_models(
-            "legal_faiss.index",
-            "legal_chunk_mapping.pkl", 
-            "legal_chunk_texts.pkl"
+            self.config['index']['index_path'],
+            self.config['index']['mapping_path'],
+            self.config['index']['chunk_text_path']
         )
         return model
     
     def generate_answer_only(self, question):
-        """Generate answer for Gradio interface."""
-        return self.rag_model.generate_answer(question)
+        """Stream the answer into the Gradio answer box as tokens are generated."""
+        metrics = {}
+        for answer in self.rag_model.generate_answer_stream(question, metrics=metrics):
+            yield answer
+        if metrics.get('time_to_first_token') is not None:
+            print(f"⏱️ TTFT {metrics['time_to_first_token']:.2f}s, "
+                  f"{metrics['num_tokens']} tokens in {metrics['total_time']:.2f}s, "
+                  f"prompt {metrics['prompt_tokens']} tokens ({metrics['context_chunks']} chunks)")
     
     def clear_inputs(self):
         """Clear function for Gradio."""
@@ -4,7 +4,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.models.rag_model import LegalRAGModel
-from src.utils.helpers import load_config
+from src.serving.client import RAGClient
+from src.utils.helpers import load_config, build_rag_config
 
 class LegalRAGInterface:
     def __init__(self):
@@ -13,18 +14,20 @@ class LegalRAGInterface:
         
     @st.cache_resource
     def load_model(_self):
-        """Load the RAG model (cached)."""
-        config = {
-            'embedding_model': _self.config['model']['embedding_model'],
-            'generator_model_path': "finetuned_aragpt",
-            'device': _self.config['model']['device']
-        }
+        """Load the RAG model (cached), or connect to the inference server if one is configured."""
+        server_url = _self.config.get('serving', {}).get('url')
+        if server_url:
+            return RAGClient(server_url)
+        
+        config = build_rag_config(
+            _self.config, "finetuned_aragpt", _self.config['model']['device']
+        )
         
         model = LegalRAGModel(config)
         model.load_models(
-            "legal_faiss.index",
-            "legal_chunk_mapping.pkl", 
-            "legal_chunk_texts.pkl"
+            _self.config['index']['index_path'],
+            _self.config['index']['mapping_path'],
+            _self.config['index']['chunk_text_path']
         )
         return model
     
@@ -69,16 +72,24 @@ class LegalRAGInterface:
         # Generate answer
         if st.button("🔍 تحليل السؤال القانوني", type="primary"):
             if question.strip():
+                st.markdown("### 📜 الجواب القانوني:")
+                placeholder = st.empty()
+                metrics = {}
                 with st.spinner("جاري البحث والتحليل..."):
-                    answer = self.rag_model.generate_answer(question)
+                    for i, answer in enumerate(self.rag_model.generate_answer_stream(question, metrics=metrics)):
+                        placeholder.text_area(
+                            "", 
+                            value=answer,
+                            height=200,
+                            disabled=True,
+                            key=f"answer_{i}"
+                        )
                 
-                st.markdown("### 📜 الجواب القانوني:")
-                st.text_area(
-                    "", 
-                    value=answer,
-                    height=200,
-                    disabled=True
-                )
+                if metrics.get('time_to_first_token') is not None:
+                    st.caption(
+                        f"⏱️ {metrics['time_to_first_token']:.2f}s حتى أول رمز · "
+                        f"{metrics['num_tokens']} رمز في {metrics['total_time']:.2f}s"
+                    )
             else:
                 st.warning("يرجى إدخال سؤال قانوني")
         
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from src.utils.helpers import load_pickle, save_pickle
+
+class SemanticAnswerCache:
+    """Cache of final answers keyed by query embedding and retrieved cases.
+
+    A lookup hits when a cached query has cosine similarity >= threshold to
+    the new query (inner product over normalized E5 embeddings, searched in
+    a small exact FAISS index) and its top match_top_cases retrieved case
+    ids are the same set as the new query's. Answers are also keyed by a
+    variant (decoding mode and prompt type), so outputs of one decoding
+    strategy are never served to callers of another. Entries expire after
+    ttl seconds and the least recently used ones are evicted past max_size.
+    """
+
+    def __init__(self, threshold=0.95, max_size=5000, ttl=None, match_top_cases=3, path=None, candidates=4):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.match_top_cases = match_top_cases
+        self.path = path
+        self.candidates = candidates
+        self.index = None
+        self.entries = OrderedDict()  # id -> (embedding, case_key, answer, created)
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def case_key(self, case_ids, variant=None):
+        """Variant plus the set of the first match_top_cases distinct case ids, in retrieval order."""
+        return variant, frozenset(list(dict.fromkeys(case_ids))[:self.match_top_cases])
+
+    def _ensure_index(self, dim):
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+    def _remove(self, ids):
+        if ids:
+            self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+            for entry_id in ids:
+                del self.entries[entry_id]
+
+    def _expire(self):
+        """Drop entries older than ttl."""
+        if not self.ttl or not self.entries:
+            return
+        cutoff = time.time() - self.ttl
+        expired = [entry_id for entry_id, entry in self.entries.items() if entry[3] < cutoff]
+        self.expirations += len(expired)
+        self._remove(expired)
+
+    def lookup_batch(self, embeddings, case_ids_list, variants=None):
+        """Return the cached answer (or None) for each query embedding / retrieved case ids / variant."""
+        answers = [None] * len(case_ids_list)
+        variants = variants or [None] * len(case_ids_list)
+        with self.lock:
+            self._expire()
+            if self.entries:
+                embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+                D, I = self.index.search(embeddings, min(self.candidates, len(self.entries)))
+                for row, (case_ids, variant) in enumerate(zip(case_ids_list, variants)):
+                    case_key = self.case_key(case_ids, variant)
+                    for score, entry_id in zip(D[row], I[row]):
+                        if entry_id < 0 or score < self.threshold:
+                            break
+                        entry = self.entries[entry_id]
+                        if entry[1] == case_key:
+                            answers[row] = entry[2]
+                            self.entries.move_to_end(entry_id)
+                            break
+
+            found = sum(answer is not None for answer in answers)
+            self.hits += found
+            self.misses += len(answers) - found
+        return answers
+
+    def lookup(self, embedding, case_ids, variant=None):
+        return self.lookup_batch(np.asarray(embedding).reshape(1, -1), [case_ids], [variant])[0]
+
+    def put(self, embedding, case_ids, answer, variant=None):
+        """Cache an answer, evicting the least recently used entries past max_size."""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        with self.lock:
+            self._ensure_index(embedding.shape[1])
+            entry_id = self.next_id
+            self.next_id += 1
+            self.index.add_with_ids(embedding, np.array([entry_id], dtype=np.int64))
+            self.entries[entry_id] = (embedding[0], self.case_key(case_ids, variant), answer, time.time())
+
+            overflow = len(self.entries) - self.max_size
+            if overflow > 0:
+                self.evictions += overflow
+                self._remove(list(self.entries)[:overflow])
+
+    def stats(self):
+        """Return hit/miss counters, evictions and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def save(self, path=None):
+        """Persist entries (in LRU order) to disk; the FAISS index is rebuilt on load."""
+        path = path or self.path
+        if not path:
+            return
+
+        with self.lock:
+            items = list(self.entries.values())
+        save_pickle(items, path)
+
+    def load(self, path):
+        """Load entries saved by save(), dropping expired ones; an unreadable file starts an empty cache."""
+        items = load_pickle(path, default=[])
+
+        cutoff = time.time() - self.ttl if self.ttl else None
+        items = [item for item in items if cutoff is None or item[3] >= cutoff][-self.max_size:]
+        self.index = None
+        self.entries = OrderedDict()
+        if items:
+            self._ensure_index(len(items[0][0]))
+            ids = np.arange(len(items), dtype=np.int64)
+            self.index.add_with_ids(np.vstack([item[0] for item in items]).astype(np.float32), ids)
+            self.entries = OrderedDict(zip(ids.tolist(), items))
+        self.next_id = len(items)
+        print(f"✅ Loaded {len(self.entries)} cached answers from: {path}")
+
+    def __len__(self):
+        return len(self.entries)
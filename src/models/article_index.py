@@ -0,0 +1,124 @@
+import numpy as np
+
+from src.utils.articles import article_keys, find_article_references, find_law_names, normalize_law_name
+
+def _law_matches(indexed, query):
+    """Same law when one normalized name is a whole-word prefix of the other."""
+    return indexed == query or query.startswith(indexed + " ") or indexed.startswith(query + " ")
+
+class ArticleIndex:
+    """Inverted index from normalized (law, article number) to the chunks citing it.
+
+    Keys are sorted by (law id, article) and postings are stored CSR-style
+    like BM25Index: offsets slices chunk_ids per key. Article references
+    without a law name are indexed under the empty law.
+    """
+
+    def __init__(self):
+        self.laws = []
+        self.key_laws = None
+        self.key_articles = None
+        self.offsets = None
+        self.chunk_ids = None
+        self.n_docs = 0
+        self._keys = {}
+        self._by_article = {}
+
+    def build(self, texts):
+        """Build postings for a list of chunk texts (chunk id = position in the list)."""
+        postings = set()
+        for chunk_id, text in enumerate(texts):
+            for article, law in article_keys(find_article_references(text)):
+                postings.add((law, article, chunk_id))
+        self.n_docs = len(texts)
+
+        self.laws = sorted({law for law, _, _ in postings})
+        law_ids = {law: i for i, law in enumerate(self.laws)}
+        postings = sorted((law_ids[law], article, chunk_id) for law, article, chunk_id in postings)
+        entries = np.array(postings, dtype=np.int64).reshape(-1, 3)
+
+        # One key per distinct (law, article), postings grouped behind it
+        new_key = np.any(entries[1:, :2] != entries[:-1, :2], axis=1)
+        starts = np.flatnonzero(np.r_[True, new_key]) if len(entries) else np.zeros(0, dtype=np.int64)
+        self.key_laws = entries[starts, 0].astype(np.int32)
+        self.key_articles = entries[starts, 1]
+        self.offsets = np.r_[starts, len(entries)].astype(np.int64)
+        self.chunk_ids = entries[:, 2].astype(np.int32)
+        self._build_lookup()
+        return self
+
+    def _build_lookup(self):
+        """Key id per (law id, article) and key ids per article number."""
+        self._keys = {(int(law), int(article)): i for i, (law, article) in enumerate(zip(self.key_laws, self.key_articles))}
+        self._by_article = {}
+        for i, article in enumerate(self.key_articles.tolist()):
+            self._by_article.setdefault(article, []).append(i)
+
+    def save(self, path):
+        """Save the index as one .npz file."""
+        np.savez(
+            path, laws=np.array(self.laws, dtype=str), key_laws=self.key_laws,
+            key_articles=self.key_articles, offsets=self.offsets, chunk_ids=self.chunk_ids,
+            n_docs=np.array(self.n_docs, dtype=np.int64)
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved by save()."""
+        data = np.load(path)
+        index = cls()
+        index.laws = data["laws"].tolist()
+        index.key_laws = data["key_laws"]
+        index.key_articles = data["key_articles"]
+        index.offsets = data["offsets"]
+        index.chunk_ids = data["chunk_ids"]
+        index.n_docs = int(data["n_docs"])
+        index._build_lookup()
+        return index
+
+    def __len__(self):
+        return len(self.key_articles)
+
+    def keys(self):
+        """All indexed (article, normalized law) pairs."""
+        return [(int(article), self.laws[law]) for law, article in zip(self.key_laws, self.key_articles)]
+
+    def _postings(self, keys):
+        if not keys:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.chunk_ids[self.offsets[k]:self.offsets[k + 1]] for k in keys])).astype(np.int64)
+
+    def match_laws(self, law):
+        """Ids of indexed laws matching a (raw or normalized) law name."""
+        law = normalize_law_name(law)
+        return [i for i, indexed in enumerate(self.laws) if indexed and law and _law_matches(indexed, law)]
+
+    def lookup(self, article, law=None):
+        """Chunk ids citing an article, of a given law or of any law when law is None."""
+        if law is None:
+            return self._postings(self._by_article.get(article, []))
+        law_ids = self.match_laws(law)
+        return self._postings([self._keys[(law_id, article)] for law_id in law_ids if (law_id, article) in self._keys])
+
+    def lookup_law(self, law):
+        """Chunk ids citing any article of a law."""
+        law_ids = set(self.match_laws(law))
+        return self._postings([i for i, law_id in enumerate(self.key_laws.tolist()) if law_id in law_ids])
+
+    def search(self, query):
+        """Chunk ids for the articles (or, failing that, the laws) a query mentions.
+
+        Article numbers mentioned without a law match that article in any law.
+        Returns an empty array when the query names no article or law. The
+        query is parsed as-is, like the chunks in build(); only the extracted
+        law names are normalized.
+        """
+        references = article_keys(find_article_references(query))
+        if references:
+            return np.unique(np.concatenate([
+                self.lookup(article, law or None) for article, law in references
+            ]))
+        laws = find_law_names(query)
+        if laws:
+            return np.unique(np.concatenate([self.lookup_law(law) for law in laws]))
+        return np.zeros(0, dtype=np.int64)
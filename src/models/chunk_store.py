@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+class ChunkTextStore:
+    """Read-only chunk texts backed by a memory-mapped UTF-8 blob and an offsets array.
+
+    Texts are decoded one at a time on access, so loading is near-instant and
+    the pages are shared between processes through the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = np.load(self.offsets_path(path), mmap_mode="r")
+        if os.path.getsize(path) > 0:
+            self.blob = np.memmap(path, dtype=np.uint8, mode="r")
+        else:
+            self.blob = np.zeros(0, dtype=np.uint8)
+
+    @staticmethod
+    def offsets_path(path):
+        return path + ".offsets.npy"
+
+    @staticmethod
+    def write(texts, path):
+        """Write texts as one UTF-8 blob plus an int64 offsets array (len(texts) + 1)."""
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+        with open(path, "wb") as f:
+            for data in encoded:
+                f.write(data)
+        np.save(ChunkTextStore.offsets_path(path), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def _as_int(value):
+    """value as an int when it is integral (ints, whole floats, digit strings), else None."""
+    if isinstance(value, (bool, np.bool_)):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    return None
+
+def normalize_case_ids(case_ids):
+    """Fixed-width case id array: int64 when every id is integral, unicode otherwise.
+
+    QA case ids are ints, so integral ids stored as strings or floats must
+    become int64 to compare equal in the evaluator.
+    """
+    values = list(case_ids)
+    ints = [_as_int(value) for value in values]
+    if all(value is not None for value in ints):
+        return np.asarray(ints, dtype=np.int64)
+    return np.asarray([str(value) for value in values])
+
+def write_case_ids(case_ids, path):
+    """Save case ids as a fixed-width array (see normalize_case_ids)."""
+    np.save(path, normalize_case_ids(case_ids))
+
+def load_case_ids(path):
+    """Memory-map a case id array saved by write_case_ids."""
+    case_ids = np.load(path, mmap_mode="r")
+    if case_ids.dtype.kind == "U":
+        # Older builds stored integral ids as strings
+        normalized = normalize_case_ids(case_ids)
+        if normalized.dtype == np.int64:
+            return normalized
+    return case_ids
+
+def count_tokens(tokenizer, texts, batch_size=1000):
+    """Token count of each text under tokenizer (no special tokens), as int32."""
+    counts = np.zeros(len(texts), dtype=np.int32)
+    for start in range(0, len(texts), batch_size):
+        batch = list(texts[start:start + batch_size])
+        ids = tokenizer(batch, add_special_tokens=False)["input_ids"]
+        counts[start:start + len(batch)] = [len(x) for x in ids]
+    return counts
+
+def tokenizer_fingerprint(tokenizer):
+    """Short hash of a tokenizer's vocabulary (same fingerprint = same token counts)."""
+    vocab = sorted(tokenizer.get_vocab().items())
+    return hashlib.sha1(json.dumps(vocab, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+def save_token_counts(counts, path, tokenizer, tokenizer_name):
+    """Save per-chunk token counts with a .json sidecar recording the tokenizer that produced them."""
+    np.save(path, counts)
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump({
+            "tokenizer": tokenizer_name,
+            "fingerprint": tokenizer_fingerprint(tokenizer),
+            "num_chunks": len(counts)
+        }, f, ensure_ascii=False, indent=2)
+
+def load_token_counts(path):
+    """Memory-map token counts saved by save_token_counts; returns (counts, metadata or None)."""
+    counts = np.load(path, mmap_mode="r")
+    meta = None
+    if os.path.exists(path + ".json"):
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+    return counts, meta
@@ -0,0 +1,67 @@
+import torch
+from torch import nn
+from transformers.pytorch_utils import Conv1D
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+def set_cpu_threads(intra_op_threads=None, inter_op_threads=None):
+    """Set torch intra-op / inter-op thread pools (None keeps the torch default)."""
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work has started
+            print("⚠️ inter-op threads already initialized, keeping the current setting")
+    print(f"🧵 CPU threads: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+
+def conv1d_to_linear(model):
+    """Replace GPT-2 style Conv1D layers (x @ W + b) with equivalent nn.Linear layers.
+
+    quantize_dynamic only knows nn.Linear, so without this AraGPT2's
+    attention and MLP projections would stay fp32.
+    """
+    for name, module in list(model.named_modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, child_name, linear)
+    return model
+
+def quantize_int8(model, skip=("lm_head",)):
+    """Dynamic int8 quantization of every nn.Linear except the skipped names.
+
+    lm_head is skipped because it is tied to the input embeddings.
+    """
+    conv1d_to_linear(model)
+    linear_names = {
+        name for name, module in model.named_modules()
+        if isinstance(module, nn.Linear) and name.split(".")[-1] not in skip
+    }
+    return torch.ao.quantization.quantize_dynamic(model, linear_names, dtype=torch.qint8)
+
+def optimize_for_cpu(model, precision="fp32"):
+    """Return the eval-mode model in the requested CPU precision (fp32, bf16 or int8)."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown CPU precision: {precision} (expected one of {PRECISIONS})")
+
+    model = model.eval()
+    if precision == "bf16":
+        model = model.to(torch.bfloat16)
+    elif precision == "int8":
+        model = quantize_int8(model)
+    return model
+
+def model_size_mb(model):
+    """Size of the model's state dict in MB (packed int8 weights included)."""
+    size = 0
+    for value in model.state_dict().values():
+        if isinstance(value, torch.Tensor):
+            size += value.numel() * value.element_size()
+        elif isinstance(value, tuple):
+            size += sum(v.numel() * v.element_size() for v in value if isinstance(v, torch.Tensor))
+    return size / 2**20
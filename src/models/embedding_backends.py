@@ -0,0 +1,179 @@
+import hashlib
+import os
+
+import torch
+from torch import nn
+
+BACKENDS = ("torch", "torchscript", "onnx")
+
+class _HiddenStates(nn.Module):
+    """Encoder wrapper with a plain (input_ids, attention_mask) -> last_hidden_state signature."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+def export_fingerprint(model_name, max_length=512):
+    """Short hash of the checkpoint an exported graph is built from, read from its files.
+
+    Covers the model name, config.json, the name, size and modification time
+    of each weight file (hub cache blobs are also named by content hash),
+    the maximum sequence length and the torch version, so the eager model
+    does not have to be loaded to find an existing export.
+    """
+    from transformers.utils import cached_file
+
+    config_path = cached_file(model_name, "config.json")
+    with open(config_path, encoding="utf-8") as f:
+        parts = [model_name, f.read(), str(max_length), torch.__version__]
+    directory = os.path.dirname(config_path)
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".safetensors", ".bin")):
+            real_path = os.path.realpath(os.path.join(directory, name))
+            stat = os.stat(real_path)
+            parts.append(f"{name}:{os.path.basename(real_path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("\x00".join(parts).encode("utf-8")).hexdigest()[:12]
+
+def fingerprinted_path(path, fingerprint):
+    """models/encoder/e5.onnx -> models/encoder/e5.<fingerprint>.onnx"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{fingerprint}{ext}"
+
+def _example_inputs(model):
+    input_ids = torch.full((2, 16), 5, dtype=torch.long, device=model.device)
+    return input_ids, torch.ones_like(input_ids)
+
+
+class TorchBackend:
+    """Eager PyTorch encoder (the default)."""
+
+    name = "torch"
+
+    def __init__(self, model):
+        self.model = model
+        self.device = model.device
+
+    def __call__(self, input_ids, attention_mask):
+        with torch.no_grad():
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+
+class TorchScriptBackend:
+    """Traced, frozen TorchScript graph of the encoder (cached to path when given).
+
+    load_model is only called when the graph has to be traced.
+    """
+
+    name = "torchscript"
+
+    def __init__(self, load_model, path=None):
+        self.device = torch.device("cpu")
+        if path and os.path.exists(path):
+            self.graph = torch.jit.load(path, map_location=self.device)
+            print(f"✅ Loaded TorchScript encoder from: {path}")
+        else:
+            model = load_model()
+            with torch.no_grad():
+                traced = torch.jit.trace(_HiddenStates(model).eval(), _example_inputs(model), check_trace=False)
+            self.graph = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+            if path:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                torch.jit.save(self.graph, path)
+                print(f"✅ Saved TorchScript encoder to: {path}")
+
+    def __call__(self, input_ids, attention_mask):
+        with torch.no_grad():
+            return self.graph(input_ids, attention_mask)
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU session over the exported encoder.
+
+    The graph is exported once to path with dynamic batch and sequence
+    axes; with quantize=True it is additionally converted with ONNX
+    Runtime's dynamic int8 quantization. load_model is only called when
+    the graph has to be exported.
+    """
+
+    name = "onnx"
+
+    def __init__(self, load_model, path, quantize=False, num_threads=None):
+        import onnxruntime as ort
+
+        self.device = torch.device("cpu")
+        if not os.path.exists(path):
+            self.export(load_model(), path)
+
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantized_path = path.replace(".onnx", ".int8.onnx")
+            if not os.path.exists(quantized_path):
+                quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+            path = quantized_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        print(f"✅ Loaded ONNX encoder from: {path}")
+
+    @staticmethod
+    def export(model, path):
+        """Export the fp32 encoder to ONNX with dynamic batch/sequence axes."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        model = model.float().cpu().eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                _HiddenStates(model), _example_inputs(model), path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"}
+                },
+                opset_version=14
+            )
+        print(f"✅ Exported ONNX encoder to: {path}")
+
+    def __call__(self, input_ids, attention_mask):
+        (hidden,) = self.session.run(
+            ["last_hidden_state"],
+            {"input_ids": input_ids.cpu().numpy(), "attention_mask": attention_mask.cpu().numpy()}
+        )
+        return torch.from_numpy(hidden)
+
+
+def create_backend(load_model, model_name, device, backend="torch", path=None, cpu_precision=None,
+                   num_threads=None, max_length=512):
+    """Build the configured encoder backend; load_model() returns the eager encoder.
+
+    Exported backends run on CPU only; on other devices the eager backend
+    is used instead. They only load the eager model to build a missing
+    export and do not keep it afterwards. Export paths get a fingerprint of
+    the checkpoint files and max_length, so a changed model is re-exported
+    instead of reusing a stale graph.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {BACKENDS})")
+    if backend != "torch" and torch.device(device).type != "cpu":
+        print(f"⚠️ {backend} backend runs on CPU only, using eager torch on {device}")
+        backend = "torch"
+
+    if backend == "onnx":
+        path = path or "models/encoder/e5.onnx"
+    if backend != "torch" and path:
+        path = fingerprinted_path(path, export_fingerprint(model_name, max_length))
+
+    if backend == "torchscript":
+        return TorchScriptBackend(load_model, path)
+    if backend == "onnx":
+        if cpu_precision == "bf16":
+            raise ValueError("The onnx embedding backend supports fp32 or int8, not bf16")
+        return OnnxBackend(load_model, path, quantize=cpu_precision == "int8", num_threads=num_threads)
+    return TorchBackend(load_model())
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.helpers import load_pickle, normalize_arabic, save_pickle
+
+def encoder_id(model_name, backend="torch", precision=None):
+    """Cache identity of an encoder: the model name, plus backend/precision when not eager fp32.
+
+    Vectors from different backends or precisions differ slightly, so they
+    must not share cache entries; the eager fp32 id stays the bare model name.
+    """
+    if backend == "torch" and not precision:
+        return model_name
+    return f"{model_name}|{backend}|{precision or 'fp32'}"
+
+class QueryEmbeddingCache:
+    def __init__(self, max_size=10000, path=None):
+        self.max_size = max_size
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def make_key(query, method, model_name):
+        """Build a cache key from the normalized query, pooling method and encoder id."""
+        return (normalize_arabic(query), method, model_name)
+
+    def get(self, key):
+        """Return the cached embedding for key (or None) and update hit/miss counters."""
+        embedding = self.entries.get(key)
+        if embedding is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return embedding
+
+    def put(self, key, embedding):
+        """Insert an embedding, evicting the least recently used entries past max_size."""
+        self.entries[key] = embedding
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.entries),
+            "max_size": self.max_size
+        }
+
+    def save(self, path=None):
+        """Persist cache entries (in LRU order) to disk."""
+        path = path or self.path
+        if not path:
+            return
+
+        save_pickle(list(self.entries.items()), path)
+
+    def load(self, path):
+        """Load cache entries saved by save(); an unreadable file starts an empty cache."""
+        items = load_pickle(path, default=[])
+
+        self.entries = OrderedDict(items[-self.max_size:] if self.max_size else [])
+        print(f"✅ Loaded {len(self.entries)} cached query embeddings from: {path}")
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class EmbeddingStore:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.vectors_path = os.path.join(cache_dir, "vectors.npy")
+        self.keys_path = os.path.join(cache_dir, "keys.pkl")
+        self.rows = {}
+        self.vectors = None
+        self.pending_vectors = []
+
+        if os.path.exists(self.vectors_path) and os.path.exists(self.keys_path):
+            self.load()
+
+    @staticmethod
+    def make_key(text, model_name, method):
+        """Content hash of (chunk text, encoder id, pooling method)."""
+        payload = "\x00".join([model_name, method, text]).encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+
+    def load(self):
+        """Load stored vectors (memory-mapped) and their key index."""
+        vectors = np.load(self.vectors_path, mmap_mode="r")
+        with open(self.keys_path, "rb") as f:
+            keys = pickle.load(f)
+        if len(keys) != len(vectors):
+            # Interrupted save(): the two files are out of step, start over
+            print(f"⚠️ Ignoring embedding store with {len(keys)} keys for {len(vectors)} vectors: {self.cache_dir}")
+            self.vectors, self.rows = None, {}
+            return
+        self.vectors = vectors
+        self.rows = {key: row for row, key in enumerate(keys)}
+        print(f"✅ Loaded {len(self.rows)} cached embeddings from: {self.cache_dir}")
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get_many(self, keys):
+        """Return a float32 matrix of stored vectors for keys that are all present."""
+        rows = np.fromiter((self.rows[key] for key in keys), dtype=np.int64, count=len(keys))
+        n_saved = 0 if self.vectors is None else len(self.vectors)
+        if n_saved:
+            dim = self.vectors.shape[1]
+        else:
+            dim = len(self.pending_vectors[0]) if self.pending_vectors else 0
+
+        out = np.empty((len(rows), dim), dtype="float32")
+        saved = rows < n_saved
+        if saved.any():
+            out[saved] = self.vectors[rows[saved]]
+        if not saved.all():
+            out[~saved] = np.vstack(self.pending_vectors)[rows[~saved] - n_saved]
+        return out
+
+    def add(self, keys, vectors):
+        """Add newly computed vectors; they are written on the next save()."""
+        for key, vector in zip(keys, vectors):
+            if key in self.rows:
+                continue
+            self.rows[key] = len(self.rows)
+            self.pending_vectors.append(np.asarray(vector, dtype="float32"))
+
+    def save(self, keep_keys=None):
+        """Write the store to disk, optionally dropping vectors not in keep_keys."""
+        if self.vectors is None and not self.pending_vectors:
+            return
+
+        keys = sorted(self.rows, key=self.rows.get)
+        if keep_keys is not None:
+            keep_keys = set(keep_keys)
+            keys = [key for key in keys if key in keep_keys]
+        vectors = self.get_many(keys)
+
+        # Write both files aside first so a crash never leaves a half-written one
+        os.makedirs(self.cache_dir, exist_ok=True)
+        vectors_tmp = self.vectors_path + ".tmp.npy"
+        keys_tmp = self.keys_path + ".tmp"
+        np.save(vectors_tmp, vectors)
+        with open(keys_tmp, "wb") as f:
+            pickle.dump(keys, f)
+        self.vectors = None  # release the old memory map before replacing it
+        os.replace(vectors_tmp, self.vectors_path)
+        os.replace(keys_tmp, self.keys_path)
+
+        self.pending_vectors = []
+        self.load()
@@ -1,54 +1,230 @@
+import threading
+import numpy as np
 import torch
 from tqdm import tqdm
 from transformers import AutoTokenizer, AutoModel
 
+from src.models.cpu_inference import optimize_for_cpu
+from src.models.embedding_backends import create_backend
+from src.models.embedding_cache import QueryEmbeddingCache, EmbeddingStore, encoder_id
+from src.utils.helpers import normalize_arabic, save_on_exit, timed
+
 class EmbeddingModel:
-    def __init__(self, model_name, device):
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
-        self.model = AutoModel.from_pretrained(model_name, trust_remote_code=True).to(device).eval()
+    def __init__(self, model_name, device, query_cache_size=0, query_cache_path=None,
+                 lazy=False, use_safetensors=None, load_report=None, cpu_precision=None,
+                 backend="torch", backend_path=None, num_threads=None):
+        self.model_name = model_name
         self.device = device
-        
+        self.use_safetensors = use_safetensors
+        self.cpu_precision = cpu_precision
+        self.backend_name = backend
+        self.backend_path = backend_path
+        self.num_threads = num_threads
+        self.max_length = 512
+        # Cache identity: reduced precision applies on CPU only
+        self.encoder_id = encoder_id(model_name, backend, cpu_precision if str(device) == "cpu" else None)
+        self._backend = None
+        self.load_report = load_report if load_report is not None else {}
+        self._tokenizer = None
+        self._model = None
+        self._load_lock = threading.Lock()
+        if not lazy:
+            self.load()
+
+        # Optional LRU cache of query embeddings keyed on the normalized query
+        self.query_cache = None
+        if query_cache_size:
+            self.query_cache = QueryEmbeddingCache(query_cache_size, query_cache_path)
+            if query_cache_path:
+                save_on_exit(self.query_cache.save)
+
+    def _load_eager_model(self):
+        """Load the eager encoder (safetensors weights are memory-mapped)."""
+        model = AutoModel.from_pretrained(
+            self.model_name, trust_remote_code=True,
+            low_cpu_mem_usage=True, use_safetensors=self.use_safetensors
+        ).to(self.device).eval()
+
+        # CPU inference profile: bf16 or dynamic int8 linear layers
+        # (the onnx backend quantizes its own exported graph instead)
+        if self.cpu_precision and str(self.device) == "cpu" and self.backend_name != "onnx":
+            model = optimize_for_cpu(model, self.cpu_precision)
+        return model
+
+    def load(self):
+        """Load the tokenizer and encoder backend.
+
+        Exported backends load the eager model only to build a missing
+        export, and free it afterwards.
+        """
+        with self._load_lock:
+            if self._backend is not None:
+                return
+            with timed(self.load_report, "embedding_model"):
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name, trust_remote_code=True)
+                backend = create_backend(
+                    self._load_eager_model, self.model_name, self.device, self.backend_name,
+                    path=self.backend_path,
+                    cpu_precision=self.cpu_precision if str(self.device) == "cpu" else None,
+                    num_threads=self.num_threads, max_length=self.max_length
+                )
+                self._model = getattr(backend, "model", None)
+                self._backend = backend
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self.load()
+        return self._tokenizer
+
+    @property
+    def model(self):
+        """Eager encoder, or None when an exported backend replaced it."""
+        if self._backend is None:
+            self.load()
+        return self._model
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self.load()
+        return self._backend
+
     def mean_pooling(self, model_output, attention_mask):
-        """Compute mean pooling over the token embeddings."""
-        token_embeddings = model_output.last_hidden_state
+        """Compute mean pooling over the token embeddings (model output or hidden-state tensor)."""
+        token_embeddings = getattr(model_output, "last_hidden_state", model_output)
         input_mask_exp = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
         return (token_embeddings * input_mask_exp).sum(1) / input_mask_exp.sum(1)
-    
-    def embed_texts(self, texts, method="mean", batch_size=8):
-        """Embed list of texts using the model and return normalized embeddings."""
+
+    def _encode_features(self, encoded, method="mean"):
+        """Run the encoder on tokenized features and return normalized embeddings."""
+        encoded = encoded.to(self.backend.device)
+
+        with torch.no_grad():
+            token_embeddings = self.backend(encoded["input_ids"], encoded["attention_mask"])
+            if method == "mean":
+                batch_embeds = self.mean_pooling(token_embeddings, encoded["attention_mask"])
+            else:
+                batch_embeds = token_embeddings[:, 0, :]
+            batch_embeds = torch.nn.functional.normalize(batch_embeds, p=2, dim=1)
+
+        return batch_embeds.float().cpu()
+
+    def _encode_batch(self, batch, method="mean"):
+        """Tokenize a padded batch, run the encoder and return normalized embeddings."""
+        encoded = self.tokenizer(
+            batch, padding=True, truncation=True,
+            return_tensors="pt", max_length=self.max_length
+        )
+        return self._encode_features(encoded, method=method)
+
+    def embed_texts(self, texts, method="mean", batch_size=8, store=None, max_tokens_per_batch=None):
+        """Embed list of texts using the model and return normalized embeddings.
+
+        When an EmbeddingStore is given, only texts whose content hash is not
+        already stored are encoded; the rest are read back from the store.
+        With max_tokens_per_batch set, texts are batched by length under a
+        padded-token budget instead of in fixed groups of batch_size.
+        """
+        if store is not None:
+            return self._embed_texts_cached(texts, method, batch_size, store, max_tokens_per_batch)
+        if max_tokens_per_batch:
+            return self._embed_texts_bucketed(texts, method, max_tokens_per_batch)
+
         embeddings = []
-        
+
         for i in tqdm(range(0, len(texts), batch_size), desc="Embedding"):
-            batch = texts[i:i+batch_size]
-            encoded = self.tokenizer(
-                batch, padding=True, truncation=True, 
-                return_tensors="pt", max_length=512
-            ).to(self.model.device)
-            
-            with torch.no_grad():
-                output = self.model(**encoded)
-                if method == "mean":
-                    batch_embeds = self.mean_pooling(output, encoded["attention_mask"])
-                else:
-                    batch_embeds = output.last_hidden_state[:, 0, :]
-                batch_embeds = torch.nn.functional.normalize(batch_embeds, p=2, dim=1)
-            
-            embeddings.append(batch_embeds.cpu())
-        
+            embeddings.append(self._encode_batch(texts[i:i+batch_size], method=method))
+
         return torch.cat(embeddings, dim=0)
-    
+
+    def _token_budget_batches(self, lengths, max_tokens_per_batch):
+        """Group indices sorted by length so each padded batch stays under the token budget."""
+        order = np.argsort(-lengths, kind="stable")
+        batches, current = [], []
+
+        for idx in order:
+            # Sorted longest first, so the first item sets the padded length
+            if current and (len(current) + 1) * lengths[current[0]] > max_tokens_per_batch:
+                batches.append(current)
+                current = []
+            current.append(idx)
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_texts_bucketed(self, texts, method, max_tokens_per_batch):
+        """Pre-tokenize, sort by length and encode under a max-tokens-per-batch budget."""
+        tokenized = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        lengths = np.array([len(ids) for ids in tokenized["input_ids"]])
+        batches = self._token_budget_batches(lengths, max_tokens_per_batch)
+
+        embeddings = [None] * len(texts)
+        for batch in tqdm(batches, desc="Embedding"):
+            features = self.tokenizer.pad(
+                {key: [tokenized[key][i] for i in batch] for key in tokenized.keys()},
+                padding=True, return_tensors="pt"
+            )
+            for i, embed in zip(batch, self._encode_features(features, method=method)):
+                embeddings[i] = embed
+
+        # Restore the original input order
+        return torch.stack(embeddings, dim=0)
+
+    def _embed_texts_cached(self, texts, method, batch_size, store, max_tokens_per_batch=None):
+        """Encode only new or changed texts and assemble the rest from the store."""
+        keys = [EmbeddingStore.make_key(text, self.encoder_id, method) for text in texts]
+
+        # Encode each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in store and key not in missing:
+                missing[key] = text
+
+        print(f"♻️ Reusing {len(texts) - len(missing)} cached embeddings, encoding {len(missing)} new chunks")
+        if missing:
+            new_embeds = self.embed_texts(
+                list(missing.values()), method=method, batch_size=batch_size,
+                max_tokens_per_batch=max_tokens_per_batch
+            )
+            store.add(list(missing.keys()), new_embeds.numpy())
+
+        return torch.from_numpy(store.get_many(keys))
+
+    def _encode_queries(self, queries, method="mean", batch_size=32):
+        """Run the encoder over normalized queries in padded batches and return a float32 matrix."""
+        queries = [f"query: {normalize_arabic(query)}" for query in queries]  # E5 format
+        embeddings = [
+            self._encode_batch(queries[i:i+batch_size], method=method)
+            for i in range(0, len(queries), batch_size)
+        ]
+        return torch.cat(embeddings, dim=0).numpy().astype("float32")
+
+    def embed_queries(self, queries, method="mean", batch_size=32):
+        """Embed a list of queries in padded batches and return a float32 matrix.
+
+        Queries are always encoded in normalized form (like the indexed chunks),
+        so enabling the query cache, where only misses go through the encoder,
+        does not change the embeddings.
+        """
+        if self.query_cache is None:
+            return self._encode_queries(queries, method=method, batch_size=batch_size)
+
+        keys = [QueryEmbeddingCache.make_key(q, method, self.encoder_id) for q in queries]
+        cached = [self.query_cache.get(key) for key in keys]
+
+        # Encode each distinct missing query once
+        missing = list(dict.fromkeys(key for key, emb in zip(keys, cached) if emb is None))
+        if missing:
+            new_embeds = self._encode_queries([key[0] for key in missing], method=method, batch_size=batch_size)
+            for key, emb in zip(missing, new_embeds):
+                self.query_cache.put(key, emb)
+            computed = dict(zip(missing, new_embeds))
+            cached = [emb if emb is not None else computed[key] for key, emb in zip(keys, cached)]
+
+        return np.vstack(cached).astype("float32")
+
     def embed_query(self, query, method="mean"):
         """Embed a single query for retrieval."""
-        query = f"query: {query}"  # E5 format
-        inputs = self.tokenizer(
-            query, return_tensors="pt", truncation=True, 
-            padding=True, max_length=512
-        ).to(self.device)
-        
-        with torch.no_grad():
-            output = self.model(**inputs)
-            if method == "mean":
-                embeddings = self.mean_pooling(output, inputs["attention_mask"])
-            else:
-                embeddings = output.last_hidden_state[:, 0, :]
-            return torch.nn.functional.normalize(embeddings, p=2, dim=1).cpu().numpy()
\ No newline at end of file
+        return self.embed_queries([query], method=method)
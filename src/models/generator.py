@@ -1,16 +1,150 @@
 import torch
-import re
-from transformers import AutoTokenizer, AutoModelForCausalLM
+import queue
+import threading
+import time
+from transformers import AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer
+
+from src.models.cpu_inference import optimize_for_cpu
+from src.utils.articles import find_article_references, format_article_references
+from src.utils.helpers import timed
+
+class _CountingStreamer(TextIteratorStreamer):
+    """TextIteratorStreamer that also counts the generated (non-prompt) tokens.
+
+    Decoding happens under tokenizer_lock, shared with the other users of the tokenizer.
+    """
+
+    def __init__(self, tokenizer, tokenizer_lock, **kwargs):
+        super().__init__(tokenizer, **kwargs)
+        self.tokenizer_lock = tokenizer_lock
+        self.num_tokens = 0
+
+    def put(self, value):
+        if not (self.skip_prompt and self.next_tokens_are_prompt):
+            self.num_tokens += value.numel()
+        with self.tokenizer_lock:
+            super().put(value)
+
+    def end(self):
+        with self.tokenizer_lock:
+            super().end()
+
+DECODING_MODES = ("beam", "greedy", "assisted")
 
 class LegalGenerator:
-    def __init__(self, model_path, device):
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-        self.model = AutoModelForCausalLM.from_pretrained(model_path).to(device)
+    def __init__(self, model_path, device, lazy=False, use_safetensors=None, load_report=None,
+                 cpu_precision=None, decoding="beam", draft_model_path=None, num_assistant_tokens=5):
+        if decoding not in DECODING_MODES:
+            raise ValueError(f"Unknown decoding mode: {decoding} (expected one of {DECODING_MODES})")
+        if decoding == "assisted" and not draft_model_path:
+            raise ValueError("Assisted decoding needs a draft_model_path")
+        self.model_path = model_path
         self.device = device
-        
-        # Add padding token if missing
-        if self.tokenizer.pad_token is None:
-            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.use_safetensors = use_safetensors
+        self.cpu_precision = cpu_precision
+        self.load_report = load_report if load_report is not None else {}
+        self.decoding = decoding
+        self.draft_model_path = draft_model_path
+        self.num_assistant_tokens = num_assistant_tokens
+        self._tokenizer = None
+        self._model = None
+        self._draft_model = None
+        self.prefixes = {}
+        self._prefix_states = {}
+        self.use_prefix_cache = True  # toggle to compare against full prefill
+        self._load_lock = threading.Lock()
+        # A fast tokenizer cannot be called from two threads at once ("Already borrowed")
+        self.tokenizer_lock = threading.Lock()
+        if not lazy:
+            self.load()
+    
+    def load_tokenizer(self):
+        """Load only the tokenizer (enough for prompt packing and validation)."""
+        with self._load_lock:
+            if self._tokenizer is not None:
+                return
+            with timed(self.load_report, "generator_tokenizer"):
+                tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+                
+                # Add padding token if missing
+                if tokenizer.pad_token is None:
+                    tokenizer.pad_token = tokenizer.eos_token
+                self._tokenizer = tokenizer
+    
+    def load(self):
+        """Load the tokenizer and model (safetensors weights are memory-mapped)."""
+        self.load_tokenizer()
+        with self._load_lock:
+            if self._model is not None:
+                return
+            with timed(self.load_report, "generator"):
+                model = AutoModelForCausalLM.from_pretrained(
+                    self.model_path, low_cpu_mem_usage=True, use_safetensors=self.use_safetensors
+                ).to(self.device)
+                
+                # CPU inference profile: bf16 or dynamic int8 linear layers
+                if self.cpu_precision and str(self.device) == "cpu":
+                    model = optimize_for_cpu(model, self.cpu_precision)
+                self._model = model
+    
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self.load_tokenizer()
+        return self._tokenizer
+    
+    def tokenize(self, texts, **kwargs):
+        """Call the shared tokenizer under tokenizer_lock (server stages run on separate threads)."""
+        tokenizer = self.tokenizer
+        with self.tokenizer_lock:
+            return tokenizer(texts, **kwargs)
+
+    def batch_decode(self, sequences, **kwargs):
+        """tokenizer.batch_decode under tokenizer_lock."""
+        tokenizer = self.tokenizer
+        with self.tokenizer_lock:
+            return tokenizer.batch_decode(sequences, **kwargs)
+
+    @property
+    def model(self):
+        if self._model is None:
+            self.load()
+        return self._model
+    
+    @property
+    def draft_model(self):
+        """Small draft model for assisted decoding (same tokenizer), loaded on first use."""
+        if self._draft_model is None:
+            with self._load_lock:
+                if self._draft_model is None:
+                    with timed(self.load_report, "draft_model"):
+                        draft = AutoModelForCausalLM.from_pretrained(
+                            self.draft_model_path, low_cpu_mem_usage=True, use_safetensors=self.use_safetensors
+                        ).to(self.device).eval()
+                        if self.cpu_precision and str(self.device) == "cpu":
+                            draft = optimize_for_cpu(draft, self.cpu_precision)
+                        draft.generation_config.num_assistant_tokens = self.num_assistant_tokens
+                        self._draft_model = draft
+        return self._draft_model
+    
+    def _generation_kwargs(self, max_new_tokens):
+        """model.generate arguments for the configured decoding mode.
+
+        "beam" is the original 4-beam search. "greedy" decodes one sequence,
+        and "assisted" produces exactly the greedy output while a draft model
+        proposes num_assistant_tokens tokens at a time for the main model to
+        verify in one forward pass.
+        """
+        kwargs = dict(
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            num_beams=4 if self.decoding == "beam" else 1,
+            no_repeat_ngram_size=2,
+            pad_token_id=self.tokenizer.eos_token_id
+        )
+        if self.decoding == "assisted":
+            kwargs["assistant_model"] = self.draft_model
+        return kwargs
     
     def is_legal_arabic_question(self, text):
         """Check if text is a legal Arabic question."""
@@ -37,18 +171,14 @@ class LegalGenerator:
         ]
         return any(kw in question for kw in keywords)
     
+    def law_article_questions(self, questions):
+        """Questions routed to the law-article template (rephrased ones if there are none)."""
+        selected = [q for q in questions if self.is_law_article_question(q)]
+        return selected or [f"ما هي المواد القانونية المطبقة في {q}" for q in questions]
+    
     def extract_articles_with_law(self, text):
         """Extract legal articles from generated text."""
-        pattern = r"(?:المادة|المواد)\s+([\d\sوو\-إلى]+)\s*(?:من\s+(قانون\s+[^\nو\.]*))?"
-        matches = re.findall(pattern, text)
-        
-        output = []
-        for articles, law in matches:
-            law_name = law.strip() if law else ""
-            cleaned_articles = articles.replace("-", "إلى").replace("—", "إلى").replace("  ", " ").strip()
-            output.append(f"المواد {cleaned_articles} {law_name}")
-        
-        return "✅ المواد القانونية المستخرجة:\n" + "\n".join(output)
+        return format_article_references(find_article_references(text))
     
     def smart_clean_generated_answer(self, answer, question):
         """Clean the generated answer."""
@@ -66,19 +196,204 @@ class LegalGenerator:
     
     def generate(self, prompt, max_new_tokens=250):
         """Generate text based on prompt."""
-        inputs = self.tokenizer(
-            prompt, return_tensors="pt", truncation=True, padding=True
-        ).to(self.model.device)
-        
+        return self.generate_batch([prompt], max_new_tokens=max_new_tokens)[0]
+
+    def register_prefix(self, name, text):
+        """Register a fixed prompt prefix whose key/values are cached for generation.
+
+        The past key/values are computed on first use. Prompts starting
+        with the prefix (at the token level) then only prefill their suffix.
+        """
+        with self._load_lock:
+            self.prefixes[name] = text
+            self._prefix_states.pop(name, None)
+
+    def _prefix_state(self, name):
+        """(prefix token ids, past key/values for batch size 1), computed once per prefix."""
+        state = self._prefix_states.get(name)
+        if state is not None:
+            return state
+        # Resolve lazy loading first: load() takes the same lock
+        model = self.model
+        with self._load_lock:
+            if name not in self._prefix_states:
+                ids = self.tokenize(self.prefixes[name], return_tensors="pt")["input_ids"].to(model.device)
+                with torch.no_grad():
+                    past = model(ids, use_cache=True).past_key_values
+                if hasattr(past, "to_legacy_cache"):
+                    past = past.to_legacy_cache()
+                self._prefix_states[name] = (ids[0].tolist(), past)
+            return self._prefix_states[name]
+
+    def prefix_length(self, name):
+        """Number of tokens whose key/values are cached for a registered prefix."""
+        return len(self._prefix_state(name)[0])
+
+    def match_prefix(self, prompt, token_ids=None):
+        """Name of the registered prefix whose cache a prompt would reuse, or None."""
+        if token_ids is None:
+            token_ids = self.tokenize(prompt, truncation=True)["input_ids"]
+        return self._match_prefix(prompt, token_ids)
+
+    def _match_prefix(self, prompt, token_ids):
+        """Name of a registered prefix that this prompt starts with token-for-token, if any."""
+        for name, text in self.prefixes.items():
+            if prompt.startswith(text):
+                prefix_ids, _ = self._prefix_state(name)
+                # BPE can merge across the boundary; only reuse an exact token prefix
+                if len(token_ids) > len(prefix_ids) and token_ids[:len(prefix_ids)] == prefix_ids:
+                    return name
+        return None
+
+    def _generate_with_prefix(self, name, id_lists, max_new_tokens):
+        """Generate for prompts sharing a cached prefix, laid out as prefix + left padding + suffix."""
+        prefix_ids, past = self._prefix_state(name)
+        suffixes = [ids[len(prefix_ids):] for ids in id_lists]
+        width = max(len(suffix) for suffix in suffixes)
+        pad_id = self.tokenizer.pad_token_id
+
+        input_ids = [prefix_ids + [pad_id] * (width - len(suffix)) + suffix for suffix in suffixes]
+        attention_mask = [
+            [1] * len(prefix_ids) + [0] * (width - len(suffix)) + [1] * len(suffix) for suffix in suffixes
+        ]
+
+        kwargs = self._generation_kwargs(max_new_tokens)
+        rows = len(id_lists) * kwargs["num_beams"]
+        expanded_past = tuple(
+            tuple(t.expand(rows, *t.shape[1:]).contiguous() for t in layer) for layer in past
+        )
         with torch.no_grad():
-            generated_ids = self.model.generate(
-                **inputs,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-                num_beams=4,
-                no_repeat_ngram_size=2,
-                pad_token_id=self.tokenizer.eos_token_id
+            return self.model.generate(
+                input_ids=torch.tensor(input_ids, device=self.model.device),
+                attention_mask=torch.tensor(attention_mask, device=self.model.device),
+                past_key_values=expanded_past,
+                **kwargs
             )
-        
-        output = self.tokenizer.decode(generated_ids[0], skip_special_tokens=True)
-        return output
\ No newline at end of file
+
+    def generate_batch(self, prompts, max_new_tokens=250, batch_size=8):
+        """Generate text for many prompts in left-padded batches.
+
+        Prompts are sorted by token length so each batch pads to similar
+        lengths; outputs are returned in input order, each decoded the same
+        way as generate() (prompt plus continuation). Prompts that start with
+        a registered prefix are batched together and reuse its cached
+        key/values.
+        """
+        if not prompts:
+            return []
+        token_ids = self.tokenize(prompts, truncation=True)["input_ids"]
+        order = sorted(range(len(prompts)), key=lambda i: len(token_ids[i]))
+
+        # Assisted decoding verifies one sequence at a time
+        if self.decoding == "assisted":
+            batch_size = 1
+
+        # Group prompts by cached prefix (None = no prefix cache)
+        use_prefixes = self.use_prefix_cache and bool(self.prefixes) and self.decoding != "assisted"
+        groups = {}
+        for i in order:
+            name = self._match_prefix(prompts[i], token_ids[i]) if use_prefixes else None
+            groups.setdefault(name, []).append(i)
+
+        outputs = [None] * len(prompts)
+        for name, indices in groups.items():
+            for start in range(0, len(indices), batch_size):
+                batch = indices[start:start + batch_size]
+                if name is not None:
+                    generated_ids = self._generate_with_prefix(
+                        name, [token_ids[i] for i in batch], max_new_tokens
+                    )
+                else:
+                    inputs = self._tokenize_left_padded([prompts[i] for i in batch])
+                    with torch.no_grad():
+                        generated_ids = self.model.generate(
+                            **inputs, **self._generation_kwargs(max_new_tokens)
+                        )
+
+                texts = self.batch_decode(generated_ids, skip_special_tokens=True)
+                for i, text in zip(batch, texts):
+                    outputs[i] = text
+        return outputs
+
+    def _tokenize_left_padded(self, prompts):
+        """Tokenize a batch with left padding (decoder-only models continue from the last position).
+
+        The tokenizer is shared across server and streaming threads, so its
+        padding_side is only switched under tokenizer_lock.
+        """
+        tokenizer = self.tokenizer
+        with self.tokenizer_lock:
+            padding_side = tokenizer.padding_side
+            tokenizer.padding_side = "left"
+            try:
+                inputs = tokenizer(prompts, return_tensors="pt", truncation=True, padding=True)
+            finally:
+                tokenizer.padding_side = padding_side
+        return inputs.to(self.model.device)
+
+    def generate_stream(self, prompt, max_new_tokens=250, do_sample=False,
+                        temperature=0.7, top_p=0.9, no_repeat_ngram_size=2, metrics=None, timeout=60.0):
+        """Yield the prompt-plus-continuation text as tokens are produced (greedy or sampling).
+
+        Beam search cannot stream, so this decodes one sequence. The first
+        yield is the (truncated) prompt itself; each later yield is the full
+        text so far, matching what generate() returns at the end. An error in
+        the generation thread is re-raised here; TimeoutError is raised when
+        no token arrives for timeout seconds.
+        """
+        inputs = self.tokenize(
+            prompt, return_tensors="pt", truncation=True
+        ).to(self.model.device)
+        prompt_text = self.batch_decode(inputs["input_ids"][:1], skip_special_tokens=True)[0]
+
+        streamer = _CountingStreamer(
+            self.tokenizer, self.tokenizer_lock, skip_prompt=True, skip_special_tokens=True, timeout=timeout
+        )
+        generation_kwargs = dict(
+            **inputs,
+            streamer=streamer,
+            max_new_tokens=max_new_tokens,
+            do_sample=do_sample,
+            num_beams=1,
+            no_repeat_ngram_size=no_repeat_ngram_size,
+            pad_token_id=self.tokenizer.eos_token_id
+        )
+        if do_sample:
+            generation_kwargs.update(temperature=temperature, top_p=top_p)
+        elif self.decoding == "assisted":
+            generation_kwargs["assistant_model"] = self.draft_model
+
+        errors = []
+
+        def run():
+            try:
+                with torch.no_grad():
+                    self.model.generate(**generation_kwargs)
+            except Exception as e:
+                # Unblock the consumer; the error is re-raised after join()
+                errors.append(e)
+                streamer.end()
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        text = prompt_text
+        yield text
+        try:
+            for piece in streamer:
+                if not piece:
+                    continue
+                if metrics is not None and 'time_to_first_token' not in metrics:
+                    metrics['time_to_first_token'] = time.perf_counter() - start
+                text += piece
+                yield text
+        except queue.Empty:
+            raise TimeoutError(f"No generated token within {timeout}s")
+        thread.join()
+        if errors:
+            raise errors[0]
+
+        if metrics is not None:
+            metrics['generation_time'] = time.perf_counter() - start
+            metrics['num_tokens'] = streamer.num_tokens
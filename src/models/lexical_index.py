@@ -0,0 +1,129 @@
+import re
+from collections import Counter
+
+import numpy as np
+
+from src.utils.helpers import normalize_arabic
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+# Longest affixes first so "وال" is stripped before "ال"
+_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+_SUFFIXES = ('ات', 'ون', 'ين', 'ان', 'ها', 'هم', 'ية', 'ة', 'ه', 'ي')
+_STOPWORDS = {
+    'في', 'من', 'على', 'الى', 'الي', 'عن', 'ان', 'او', 'ما', 'هل', 'هي', 'هو',
+    'التي', 'الذي', 'ذلك', 'هذا', 'هذه', 'مع', 'بين', 'كل', 'قد', 'لا', 'و'
+}
+
+def light_stem(token):
+    """Strip one common Arabic prefix and suffix, keeping a stem of at least 2 letters after a prefix.
+
+    Two-letter suffixes need a 4-letter stem left over, so short words whose
+    last letters only look like a suffix ("قانون") keep them and still match
+    their derived forms ("قانوني", "القانونية").
+    """
+    for prefix in _PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            token = token[len(prefix):]
+            break
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= (4 if len(suffix) == 2 else 3):
+            token = token[:-len(suffix)]
+            break
+    return token
+
+def analyze(text):
+    """Normalize, tokenize and stem text into index terms (numbers are kept as-is)."""
+    if not isinstance(text, str):
+        return []
+    tokens = _TOKEN_PATTERN.findall(normalize_arabic(text).lower())
+    return [light_stem(token) for token in tokens if token not in _STOPWORDS]
+
+class BM25Index:
+    """Compact BM25 inverted index over chunks.
+
+    Postings are stored CSR-style: term_offsets slices doc_ids/weights per term,
+    and each posting holds its precomputed BM25 impact, so a query is just a
+    sum over its terms' postings lists.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self.term_offsets = None
+        self.doc_ids = None
+        self.weights = None
+        self.n_docs = 0
+
+    def build(self, texts):
+        """Build postings for a list of chunk texts (doc id = position in the list)."""
+        doc_terms = [Counter(analyze(text)) for text in texts]
+        doc_lens = np.array([sum(counts.values()) for counts in doc_terms], dtype=np.float32)
+        avg_len = doc_lens.mean() if len(doc_lens) and doc_lens.mean() > 0 else 1.0
+        self.n_docs = len(texts)
+
+        term_ids, doc_ids, tfs = [], [], []
+        for doc_id, counts in enumerate(doc_terms):
+            for term, tf in counts.items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids = np.array(term_ids, dtype=np.int64)
+        doc_ids = np.array(doc_ids, dtype=np.int32)
+        tfs = np.array(tfs, dtype=np.float32)
+
+        # Group postings by term
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, tfs = term_ids[order], doc_ids[order], tfs[order]
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        self.term_offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=self.term_offsets[1:])
+
+        # Precompute BM25 impacts per posting
+        idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * doc_lens[doc_ids] / avg_len)
+        self.weights = idf[term_ids] * tfs * (self.k1 + 1) / (tfs + norm)
+        self.doc_ids = doc_ids
+        return self
+
+    def save(self, path):
+        """Save the index as one .npz file."""
+        terms = sorted(self.vocab, key=self.vocab.get)
+        np.savez(
+            path, terms=np.array(terms, dtype=str), term_offsets=self.term_offsets,
+            doc_ids=self.doc_ids, weights=self.weights,
+            params=np.array([self.k1, self.b, self.n_docs], dtype=np.float64)
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved by save()."""
+        data = np.load(path)
+        k1, b, n_docs = data["params"]
+        index = cls(k1=float(k1), b=float(b))
+        index.vocab = {term: i for i, term in enumerate(data["terms"].tolist())}
+        index.term_offsets = data["term_offsets"]
+        index.doc_ids = data["doc_ids"]
+        index.weights = data["weights"]
+        index.n_docs = int(n_docs)
+        return index
+
+    def search(self, query, top_k=10):
+        """Return (scores, doc_ids) of the top_k BM25 matches for one query."""
+        term_ids = [self.vocab[term] for term in set(analyze(query)) if term in self.vocab]
+        if not term_ids:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+
+        # Accumulate over the query terms' postings lists only
+        docs = np.concatenate([self.doc_ids[self.term_offsets[t]:self.term_offsets[t + 1]] for t in term_ids])
+        weights = np.concatenate([self.weights[self.term_offsets[t]:self.term_offsets[t + 1]] for t in term_ids])
+        unique_docs, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+
+        if len(scores) > top_k:
+            top = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return scores[top], unique_docs[top].astype(np.int64)
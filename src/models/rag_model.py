@@ -1,65 +1,387 @@
+import threading
+import time
+from collections import namedtuple
+
 from src.models.retriever import Retriever
 from src.models.generator import LegalGenerator
+from src.models.answer_cache import SemanticAnswerCache
+from src.models.chunk_store import tokenizer_fingerprint
+from src.models.cpu_inference import set_cpu_threads
+from src.utils.articles import format_article_references, rank_article_references
+from src.utils.helpers import save_on_exit, timed
+
+OUT_OF_SCOPE_MESSAGE = "❌ عذراً، لا يمكنني الإجابة على هذا السؤال لأنه خارج النطاق القانوني أو ليس مكتوباً بالللغة العربية القانونية."
+NO_INFO_MESSAGE = "❌ عذراً، لا أمتلك معلومات كافية للإجابة عن هذا السؤال."
+
+# Fixed start of the law-article prompt, registered with the generator's prefix cache
+ARTICLE_PROMPT_PREFIX = "المعرفة التالية مستخلصة من قضايا قانونية:\n"
+
+# A packed prompt waiting for generation
+PreparedPrompt = namedtuple(
+    "PreparedPrompt", ["prompt", "max_tokens", "prompt_tokens", "context_chunks", "cache_entry"]
+)
 
 class LegalRAGModel:
     def __init__(self, config):
         self.config = config
         self.device = config.get('device', 'cpu')
         
+        # Startup: lazy per-component loading, memory-mapped safetensors weights
+        startup = config.get('startup', {})
+        self.lazy = startup.get('lazy', False)
+        self.warmup_mode = startup.get('warmup', 'none')
+        use_safetensors = startup.get('use_safetensors')
+        self.load_report = {}
+        
+        # CPU inference profile: reduced precision and tuned thread pools
+        cpu_config = config.get('cpu_inference', {})
+        embedding_precision = generator_precision = None
+        if cpu_config.get('enabled') and str(self.device) == "cpu":
+            set_cpu_threads(cpu_config.get('intra_op_threads'), cpu_config.get('inter_op_threads'))
+            embedding_precision = cpu_config.get('embedding_precision', 'int8')
+            generator_precision = cpu_config.get('generator_precision', 'int8')
+        
         # Initialize retriever and generator
         self.retriever = Retriever(
             config['embedding_model'], 
-            self.device
+            self.device,
+            query_cache_size=config.get('query_cache_size', 0),
+            query_cache_path=config.get('query_cache_path'),
+            group_by_case=config.get('group_by_case', False),
+            case_overfetch=config.get('case_overfetch', 4),
+            case_pooling=config.get('case_pooling', 'max'),
+            fusion=config.get('fusion'),
+            fusion_weight=config.get('fusion_weight', 0.3),
+            fusion_overfetch=config.get('fusion_overfetch', 4),
+            article_filter=config.get('article_filter', False),
+            article_max_candidates=config.get('article_max_candidates', 2000),
+            lazy=self.lazy,
+            use_safetensors=use_safetensors,
+            load_report=self.load_report,
+            cpu_precision=embedding_precision,
+            embedding_backend=config.get('embedding', {}).get('backend', 'torch'),
+            embedding_backend_path=config.get('embedding', {}).get('backend_path'),
+            num_threads=cpu_config.get('intra_op_threads')
         )
         self.generator = LegalGenerator(
             config['generator_model_path'], 
-            self.device
+            self.device,
+            lazy=self.lazy,
+            use_safetensors=use_safetensors,
+            load_report=self.load_report,
+            cpu_precision=generator_precision,
+            decoding=config.get('generation', {}).get('decoding', 'beam'),
+            draft_model_path=config.get('generation', {}).get('draft_model_path'),
+            num_assistant_tokens=config.get('generation', {}).get('num_assistant_tokens', 5)
         )
-    
-    def load_models(self, index_path, mapping_path, chunk_text_path):
-        """Load the retrieval index."""
-        self.retriever.load_index(index_path, mapping_path, chunk_text_path)
-    
-    def generate_answer(self, question, top_k=3, threshold=0.6):
-        """Complete RAG pipeline for question answering."""
-        # Check if question is valid
-        if not self.generator.is_legal_arabic_question(question):
-            return "❌ عذراً، لا يمكنني الإجابة على هذا السؤال لأنه خارج النطاق القانوني أو ليس مكتوباً بالللغة العربية القانونية."
         
-        # Step 1: Retrieve relevant documents
-        retrieval_results, _ = self.retriever.retrieve(
-            query=question, top_k=top_k
-        )
+        # Precomputed chunk token counts are used only if the generator's tokenizer produced them
+        self._token_counts_valid = None
         
-        # Check retrieval quality
-        if not retrieval_results or retrieval_results[0][1] < threshold:
-            return "❌ عذراً، لا أمتلك معلومات كافية للإجابة عن هذا السؤال."
+        # "extractive": answer law-article questions from the retrieved chunks without generation
+        self.article_mode = config.get('generation', {}).get('article_mode', 'generative')
+        self.max_article_references = config.get('generation', {}).get('max_article_references', 10)
         
-        # Step 2: Prepare context
-        context = "\n".join(res[0] for res in retrieval_results)
+        # Reuse the key/values of fixed template prefixes across requests
+        if config.get('generation', {}).get('prefix_cache', False):
+            self.generator.register_prefix("law_article", ARTICLE_PROMPT_PREFIX)
         
-        # Step 3: Create prompt based on question type
+        # Optional semantic cache of final answers
+        self.answer_cache = None
+        cache_config = config.get('answer_cache', {})
+        if cache_config.get('enabled'):
+            ttl_hours = cache_config.get('ttl_hours')
+            self.answer_cache = SemanticAnswerCache(
+                threshold=cache_config.get('threshold', 0.95),
+                max_size=cache_config.get('max_size', 5000),
+                ttl=ttl_hours * 3600 if ttl_hours else None,
+                match_top_cases=cache_config.get('match_top_cases', 3),
+                path=cache_config.get('path')
+            )
+            if cache_config.get('path'):
+                save_on_exit(self.answer_cache.save)
+    
+    def load_models(self, index_path, mapping_path, chunk_text_path):
+        """Load the retrieval index (deferred in lazy mode), then run the configured warm-up."""
+        self.retriever.load_index(
+            index_path, mapping_path, chunk_text_path,
+            index_config=self.config.get('index'),
+            lazy=self.lazy
+        )
+        
+        if self.warmup_mode == "sync":
+            self.warmup()
+        else:
+            if self.warmup_mode == "background":
+                threading.Thread(target=self.warmup, daemon=True).start()
+            self.print_load_report()
+    
+    def warmup(self):
+        """Load every component and run one tiny retrieval + generation pass."""
+        question = "ما هو الحكم في قضية عقد الإيجار؟"
+        with timed(self.load_report, "warmup"):
+            scores, chunk_ids, _ = self.retriever.retrieve_batch([question], top_k=1)
+            results = self.retriever.vector_store.format_results(scores[0], chunk_ids[0])
+            prepared = self._build_prompt(question, results)
+            self.generator.generate_batch([prepared.prompt], max_new_tokens=1)
+        self.print_load_report()
+    
+    def print_load_report(self):
+        """Print per-component load times (seconds) recorded so far."""
+        report = ", ".join(f"{name}: {seconds:.2f}s" for name, seconds in self.load_report.items())
+        print(f"⏱️ Load times: {report or 'nothing loaded yet (lazy)'}")
+    
+    def _render_prompt(self, question, context):
+        """Fill the prompt template for the question type; returns (prompt, max_new_tokens)."""
         if self.generator.is_law_article_question(question):
             prompt = (
-                f"المعرفة التالية مستخلصة من قضايا قانونية:\n{context}\n\n"
+                f"{ARTICLE_PROMPT_PREFIX}{context}\n\n"
                 f"استناداً إليها، ما هي **جميع المواد القانونية** التي يجب استخدامها لحل القضية التالية:\n"
                 f"{question}\n\n"
                 f"استخرج المواد القانونية الحقيقية التي وردت في النص، ولا تكرر أمثلة وهمية.\n"
                 f"الجواب:"
             )
-            max_tokens = 100
-        else:
-            prompt = f"{question}\n الجواب:\n{context}"
-            max_tokens = 250
-        
-        # Step 4: Generate answer
-        generated_output = self.generator.generate(prompt, max_new_tokens=max_tokens)
-        
-        # Step 5: Post-process answer
+            return prompt, 100
+        return f"{question}\n الجواب:\n{context}", 250
+
+    def _build_prompt(self, question, retrieval_results, token_counts=None):
+        """Pack retrieved chunks into the prompt under the generator token budget.
+
+        The question and template are always kept; chunks are added greedily
+        in retrieval order while they fit (token_counts are the precomputed
+        per-chunk generator token counts, counted on the fly when missing).
+        The packed prompt is re-tokenized and trimmed if BPE merges at the
+        joins pushed it over budget.
+        """
+        tokenize = self.generator.tokenize  # shared with the generation thread, so called under its lock
+        _, max_tokens = self._render_prompt(question, "")
+        budget = self.generator.tokenizer.model_max_length - max_tokens
+        max_prompt_tokens = self.config.get('generation', {}).get('max_prompt_tokens')
+        if max_prompt_tokens:
+            budget = min(budget, max_prompt_tokens)
+
+        texts = [res[0] for res in retrieval_results]
+        if token_counts is None:
+            token_counts = [len(ids) for ids in tokenize(texts, add_special_tokens=False)["input_ids"]] if texts else []
+
+        used = len(tokenize(self._render_prompt(question, "")[0])["input_ids"])
+        selected = []
+        for text, count in zip(texts, token_counts):
+            if used + count + 1 <= budget:  # +1 for the joining newline
+                selected.append(text)
+                used += count + 1
+
+        while True:
+            prompt, _ = self._render_prompt(question, "\n".join(selected))
+            prompt_tokens = len(tokenize(prompt)["input_ids"])
+            if prompt_tokens <= budget or not selected:
+                break
+            selected.pop()
+        return PreparedPrompt(prompt, max_tokens, prompt_tokens, len(selected), None)
+
+    def _chunk_token_counts(self, chunk_ids):
+        """Precomputed token counts of one result row, or None to count on the fly."""
+        vector_store = self.retriever.vector_store
+        if vector_store.token_counts is None:
+            return None
+        if self._token_counts_valid is None:
+            meta = vector_store.token_counts_meta or {}
+            tokenizer = self.generator.tokenizer
+            with self.generator.tokenizer_lock:
+                fingerprint = tokenizer_fingerprint(tokenizer)
+            self._token_counts_valid = meta.get('fingerprint') == fingerprint
+            if not self._token_counts_valid:
+                print(f"⚠️ Chunk token counts come from another tokenizer ({meta.get('tokenizer')}), counting on the fly")
+        return vector_store.chunk_token_counts(chunk_ids) if self._token_counts_valid else None
+
+    def _postprocess(self, question, generated_output):
+        """Turn raw generator output into the displayed answer."""
         if self.generator.is_law_article_question(question):
             return self.generator.extract_articles_with_law(generated_output)
+        return self.generator.smart_clean_generated_answer(generated_output, question)
+
+    def _extract_article_answer(self, question, retrieval_results):
+        """Extractive answer for a law-article question, or None to fall back to generation."""
+        if self.article_mode != "extractive" or not self.generator.is_law_article_question(question):
+            return None
+        references = rank_article_references(retrieval_results, self.max_article_references)
+        return format_article_references(references) if references else None
+
+    def _answer_variant(self, question, stream=False):
+        """Semantic-cache variant of an answer: (decoding, prompt type), or None when sampled."""
+        if stream:
+            if self.config.get('generation', {}).get('stream_do_sample', False):
+                return None
+            decoding = "greedy"
         else:
-            final_answer = self.generator.smart_clean_generated_answer(
-                generated_output, question
+            # Assisted decoding reproduces the greedy output
+            decoding = "beam" if self.generator.decoding == "beam" else "greedy"
+        prompt_type = "article" if self.generator.is_law_article_question(question) else "general"
+        return decoding, prompt_type
+
+    def _cache_answer(self, cache_entry, answer):
+        """Store a generated answer in the semantic cache (refusals are not cached)."""
+        if self.answer_cache is not None and cache_entry is not None and answer != NO_INFO_MESSAGE:
+            embedding, case_ids, variant = cache_entry
+            self.answer_cache.put(embedding, case_ids, answer, variant)
+
+    def generate_answer(self, question, top_k=3, threshold=0.6):
+        """Complete RAG pipeline for question answering."""
+        return self.generate_answers([question], top_k=top_k, threshold=threshold)[0]
+
+    def prepare_prompts(self, questions, top_k=3, threshold=0.6, stream=False):
+        """Batched validation and retrieval stage of generate_answers.
+
+        Returns one entry per question: a final answer string (refusal,
+        extracted law articles or semantic cache hit), or a PreparedPrompt
+        ready for generate_from_prompts. stream=True selects cached answers
+        of the streaming decoding settings instead of generate_answers' ones.
+        """
+        prepared = [None] * len(questions)
+        valid = []
+        for i, question in enumerate(questions):
+            if self.generator.is_legal_arabic_question(question):
+                valid.append(i)
+            else:
+                prepared[i] = OUT_OF_SCOPE_MESSAGE
+
+        if valid:
+            scores, chunk_ids, _, query_embeddings = self.retriever.retrieve_batch(
+                [questions[i] for i in valid], top_k=top_k, return_embeddings=True
             )
-            return final_answer if final_answer.strip() else "❌ عذراً، لا أمتلك معلومات كافية للإجابة عن هذا السؤال."
+            vector_store = self.retriever.vector_store
+            pending = []
+            for row, i in enumerate(valid):
+                retrieval_results = vector_store.format_results(scores[row], chunk_ids[row])
+                if not retrieval_results or retrieval_results[0][1] < threshold:
+                    prepared[i] = NO_INFO_MESSAGE
+                    continue
+                extracted = self._extract_article_answer(questions[i], retrieval_results)
+                if extracted is not None:
+                    prepared[i] = extracted
+                else:
+                    pending.append((row, i, retrieval_results))
+
+            # Answer near-duplicate questions with the same top cases and decoding from the cache
+            variants = [self._answer_variant(questions[i], stream) for _, i, _ in pending]
+            cached = [None] * len(pending)
+            if self.answer_cache is not None and pending:
+                lookups = [n for n, variant in enumerate(variants) if variant is not None]
+                if lookups:
+                    answers = self.answer_cache.lookup_batch(
+                        query_embeddings[[pending[n][0] for n in lookups]],
+                        [[res[2] for res in pending[n][2]] for n in lookups],
+                        [variants[n] for n in lookups]
+                    )
+                    for n, answer in zip(lookups, answers):
+                        cached[n] = answer
+            for (row, i, retrieval_results), variant, answer in zip(pending, variants, cached):
+                if answer is not None:
+                    prepared[i] = answer
+                else:
+                    # Sampled answers are not cached
+                    cache_entry = None if variant is None else (
+                        query_embeddings[row], [res[2] for res in retrieval_results], variant
+                    )
+                    token_counts = self._chunk_token_counts(chunk_ids[row])
+                    prepared[i] = self._build_prompt(
+                        questions[i], retrieval_results, token_counts
+                    )._replace(cache_entry=cache_entry)
+        return prepared
+
+    def generate_from_prompts(self, questions, prepared, batch_size=8):
+        """Batched generation stage of generate_answers, in input order.
+
+        Final answer strings pass through; prompts are grouped by type (token
+        budget) and generated in length-sorted, left-padded batches.
+        """
+        answers = [None] * len(questions)
+        prompts_by_budget = {}
+        for i, item in enumerate(prepared):
+            if isinstance(item, str):
+                answers[i] = item
+            else:
+                prompts_by_budget.setdefault(item.max_tokens, []).append((i, item.prompt))
+
+        for max_tokens, items in prompts_by_budget.items():
+            outputs = self.generator.generate_batch(
+                [prompt for _, prompt in items], max_new_tokens=max_tokens, batch_size=batch_size
+            )
+            for (i, _), generated_output in zip(items, outputs):
+                final_answer = self._postprocess(questions[i], generated_output)
+                answers[i] = final_answer if final_answer.strip() else NO_INFO_MESSAGE
+                self._cache_answer(prepared[i].cache_entry, answers[i])
+        return answers
+
+    def generate_answers(self, questions, top_k=3, threshold=0.6, batch_size=8, return_usage=False):
+        """Batched RAG pipeline: answers for many questions, in input order.
+
+        Validation, query embedding and FAISS search run once over all valid
+        questions; generation runs in left-padded batches of batch_size,
+        grouped by prompt type (token budget) and sorted by prompt length.
+        Refusals are the same as generate_answer's. With return_usage, also
+        returns per-question prompt token usage (None when nothing was generated).
+        """
+        prepared = self.prepare_prompts(questions, top_k=top_k, threshold=threshold)
+        answers = self.generate_from_prompts(questions, prepared, batch_size=batch_size)
+        if return_usage:
+            return answers, [self.prompt_usage(item) for item in prepared]
+        return answers
+
+    @staticmethod
+    def prompt_usage(prepared):
+        """Token usage of a prepared prompt (None for answers that needed no generation)."""
+        if isinstance(prepared, str):
+            return None
+        return {"prompt_tokens": prepared.prompt_tokens, "context_chunks": prepared.context_chunks}
+
+    def generate_answer_stream(self, question, top_k=3, threshold=0.6, metrics=None):
+        """Streaming RAG pipeline: yield the cleaned answer so far as tokens arrive.
+
+        Post-processing is re-applied to the cumulative output at every step,
+        so each yield is what generate_answer would show if decoding stopped
+        there. If metrics is a dict it is filled with retrieval_time,
+        time_to_first_token (from the call, including retrieval), total_time,
+        num_tokens and the prompt token usage.
+        """
+        start = time.perf_counter()
+        prepared = self.prepare_prompts([question], top_k=top_k, threshold=threshold, stream=True)[0]
+        if metrics is not None:
+            metrics['retrieval_time'] = time.perf_counter() - start
+        if isinstance(prepared, str):
+            if metrics is not None:
+                metrics['total_time'] = time.perf_counter() - start
+            yield prepared
+            return
+
+        prompt, max_tokens, cache_entry = prepared.prompt, prepared.max_tokens, prepared.cache_entry
+        if metrics is not None:
+            metrics.update(self.prompt_usage(prepared))
+        generation = self.config.get('generation', {})
+        generation_metrics = {}
+        answer = ""
+        for generated_output in self.generator.generate_stream(
+            prompt, max_new_tokens=max_tokens,
+            do_sample=generation.get('stream_do_sample', False),
+            temperature=generation.get('temperature', 0.7),
+            top_p=generation.get('top_p', 0.9),
+            no_repeat_ngram_size=generation.get('no_repeat_ngram_size', 2),
+            metrics=generation_metrics,
+            timeout=generation.get('stream_timeout', 60)
+        ):
+            cleaned = self._postprocess(question, generated_output)
+            if cleaned != answer:
+                answer = cleaned
+                yield answer
+
+        if metrics is not None:
+            metrics['time_to_first_token'] = (
+                metrics['retrieval_time'] + generation_metrics['time_to_first_token']
+                if 'time_to_first_token' in generation_metrics else None
+            )
+            metrics['total_time'] = time.perf_counter() - start
+            metrics['num_tokens'] = generation_metrics.get('num_tokens', 0)
+        if not answer.strip():
+            yield NO_INFO_MESSAGE
+        else:
+            self._cache_answer(cache_entry, answer)
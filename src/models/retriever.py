@@ -1,21 +1,205 @@
+import os
+import threading
+import numpy as np
+
+from src.models.article_index import ArticleIndex
 from src.models.embeddings import EmbeddingModel
+from src.models.lexical_index import BM25Index
 from src.models.vector_store import VectorStore
+from src.utils.helpers import timed
+
+RRF_K = 60
 
 class Retriever:
-    def __init__(self, embedding_model_name, device):
-        self.embedding_model = EmbeddingModel(embedding_model_name, device)
+    def __init__(self, embedding_model_name, device, query_cache_size=0, query_cache_path=None,
+                 group_by_case=False, case_overfetch=4, case_pooling="max",
+                 fusion=None, fusion_weight=0.3, fusion_overfetch=4,
+                 lazy=False, use_safetensors=None, load_report=None, cpu_precision=None,
+                 embedding_backend="torch", embedding_backend_path=None, num_threads=None,
+                 article_filter=False, article_max_candidates=2000):
+        self.load_report = load_report if load_report is not None else {}
+        self.embedding_model = EmbeddingModel(
+            embedding_model_name, device,
+            query_cache_size=query_cache_size,
+            query_cache_path=query_cache_path,
+            lazy=lazy,
+            use_safetensors=use_safetensors,
+            load_report=self.load_report,
+            cpu_precision=cpu_precision,
+            backend=embedding_backend,
+            backend_path=embedding_backend_path,
+            num_threads=num_threads
+        )
         self.vector_store = VectorStore()
-    
-    def load_index(self, index_path, mapping_path, chunk_text_path):
-        """Load the FAISS index and mappings."""
-        self.vector_store.load_index(index_path, mapping_path, chunk_text_path)
-    
+        self._index_args = None
+        self._index_lock = threading.Lock()
+
+        # Case-aware search returns distinct cases instead of raw chunk hits
+        self.group_by_case = group_by_case
+        self.case_overfetch = case_overfetch
+        self.case_pooling = case_pooling
+
+        # Optional BM25 index fused with dense scores ("rrf" or "weighted")
+        self.lexical_index = None
+        self.fusion = fusion
+        self.fusion_weight = fusion_weight
+        self.fusion_overfetch = fusion_overfetch
+
+        # Optional (law, article) inverted index restricting queries that cite articles or laws
+        self.article_index = None
+        self.article_filter = article_filter
+        self.article_max_candidates = article_max_candidates
+
+    def load_index(self, index_path, mapping_path, chunk_text_path, index_config=None, lazy=False):
+        """Load the FAISS index and mappings (and the BM25 / article indexes when enabled).
+
+        With lazy=True the paths are recorded and loading happens on the first retrieval.
+        """
+        self._index_args = (index_path, mapping_path, chunk_text_path, index_config)
+        if not lazy:
+            self.ensure_index()
+
+    def ensure_index(self):
+        """Load the indexes recorded by load_index if that has not happened yet."""
+        with self._index_lock:
+            if self.vector_store.index is not None or self._index_args is None:
+                return
+            index_path, mapping_path, chunk_text_path, index_config = self._index_args
+            with timed(self.load_report, "faiss_index"):
+                self.vector_store.load_index(index_path, mapping_path, chunk_text_path, index_config=index_config)
+
+            lexical_path = (index_config or {}).get('lexical_index_path')
+            if self.fusion and lexical_path and os.path.exists(lexical_path):
+                with timed(self.load_report, "bm25_index"):
+                    self.lexical_index = BM25Index.load(lexical_path)
+                print(f"✅ Loaded BM25 index ({self.lexical_index.n_docs} chunks)")
+
+            article_path = (index_config or {}).get('article_index_path')
+            if self.article_filter and article_path and os.path.exists(article_path):
+                with timed(self.load_report, "article_index"):
+                    self.article_index = ArticleIndex.load(article_path)
+                print(f"✅ Loaded article index ({len(self.article_index)} law articles)")
+
+    def retrieve_batch(self, queries, top_k=5, method="mean", batch_size=32, return_embeddings=False,
+                       group_by_case=None):
+        """Retrieve relevant chunks for many queries at once.
+
+        Returns (scores, chunk_ids, case_ids) arrays of shape (len(queries), top_k),
+        followed by the query embeddings when return_embeddings is True. With
+        group_by_case (defaults to the retriever setting) each row holds top_k
+        distinct cases and their best chunks. With the article filter, queries
+        citing indexed articles or laws are ranked among the citing chunks only.
+        """
+        if group_by_case is None:
+            group_by_case = self.group_by_case
+        self.ensure_index()
+
+        # Embed all queries in padded batches
+        query_embeddings = self.embedding_model.embed_queries(
+            queries, method=method, batch_size=batch_size
+        )
+
+        # One FAISS call for the whole query matrix
+        if self.fusion and self.lexical_index is not None:
+            scores, chunk_ids, case_ids = self._hybrid_search(queries, query_embeddings, top_k, group_by_case)
+        elif group_by_case:
+            scores, chunk_ids, case_ids = self.vector_store.search_cases_batch(
+                query_embeddings, top_k=top_k,
+                overfetch=self.case_overfetch, pooling=self.case_pooling
+            )
+        else:
+            scores, chunk_ids, case_ids = self.vector_store.search_batch(query_embeddings, top_k=top_k)
+
+        if self.article_index is not None:
+            scores, chunk_ids, case_ids = self._article_search(
+                queries, query_embeddings, scores, chunk_ids, case_ids, group_by_case
+            )
+
+        if return_embeddings:
+            return scores, chunk_ids, case_ids, query_embeddings
+        return scores, chunk_ids, case_ids
+
+    def _fuse(self, dense_ids, lexical_scores, lexical_ids, dense_scores):
+        """Fused score per candidate chunk id for one query."""
+        fused = {}
+        if self.fusion == "rrf":
+            for ranked in (dense_ids, lexical_ids):
+                for rank, chunk_id in enumerate(ranked):
+                    fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        elif self.fusion == "weighted":
+            max_lexical = lexical_scores[0] if len(lexical_scores) else 1.0
+            lexical = dict(zip(lexical_ids, lexical_scores / max_lexical))
+            for chunk_id, dense in dense_scores.items():
+                fused[chunk_id] = (1 - self.fusion_weight) * dense + self.fusion_weight * lexical.get(chunk_id, 0.0)
+        else:
+            raise ValueError(f"Unknown fusion method: {self.fusion}")
+        return fused
+
+    def _hybrid_search(self, queries, query_embeddings, top_k, group_by_case):
+        """Fuse dense and BM25 candidates; returned scores are dense similarities in fused order."""
+        n_candidates = top_k * self.fusion_overfetch
+        D, I, _ = self.vector_store.search_batch(query_embeddings, top_k=n_candidates)
+
+        out_scores = np.full((len(queries), top_k), -np.inf, dtype='float32')
+        out_ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        for q, query in enumerate(queries):
+            dense_ids = [int(i) for i in I[q] if i >= 0]
+            lexical_scores, lexical_ids = self.lexical_index.search(query, top_k=n_candidates)
+            lexical_ids = lexical_ids.tolist()
+
+            # Dense similarity for every candidate, including lexical-only hits
+            candidates = list(dict.fromkeys(dense_ids + lexical_ids))
+            dense_scores = dict(zip(candidates, self.vector_store.score_chunks(query_embeddings[q], candidates)))
+
+            fused = self._fuse(dense_ids, lexical_scores, lexical_ids, dense_scores)
+            ranked = sorted(fused, key=fused.get, reverse=True)
+            if group_by_case:
+                # Keep the best fused chunk of each case
+                best_per_case = {}
+                for chunk_id in ranked:
+                    best_per_case.setdefault(self.vector_store.case_ids[chunk_id], chunk_id)
+                ranked = list(best_per_case.values())
+
+            for rank, chunk_id in enumerate(ranked[:top_k]):
+                out_ids[q, rank] = chunk_id
+                out_scores[q, rank] = dense_scores[chunk_id]
+
+        case_ids = self.vector_store.case_ids[np.where(out_ids >= 0, out_ids, 0)]
+        return out_scores, out_ids, case_ids
+
+    def _article_search(self, queries, query_embeddings, scores, chunk_ids, case_ids, group_by_case):
+        """Replace result rows of article/law queries with the best dense matches among citing chunks.
+
+        Rows are left as they are when the query cites nothing indexed or when
+        the postings exceed article_max_candidates.
+        """
+        top_k = scores.shape[1]
+        for q, query in enumerate(queries):
+            candidates = self.article_index.search(query)
+            if not len(candidates) or len(candidates) > self.article_max_candidates:
+                continue
+            candidate_scores = self.vector_store.score_chunks(query_embeddings[q], candidates)
+            ranked = candidates[np.argsort(-candidate_scores, kind="stable")]
+            if group_by_case:
+                best_per_case = {}
+                for chunk_id in ranked:
+                    best_per_case.setdefault(self.vector_store.case_ids[chunk_id], chunk_id)
+                ranked = np.array(list(best_per_case.values()), dtype=np.int64)
+            ranked = ranked[:top_k]
+            dense_scores = dict(zip(candidates.tolist(), candidate_scores))
+
+            scores[q] = -np.inf
+            chunk_ids[q] = -1
+            scores[q, :len(ranked)] = [dense_scores[int(chunk_id)] for chunk_id in ranked]
+            chunk_ids[q, :len(ranked)] = ranked
+        case_ids = self.vector_store.case_ids[np.where(chunk_ids >= 0, chunk_ids, 0)]
+        return scores, chunk_ids, case_ids
+
     def retrieve(self, query, top_k=5, method="mean"):
         """Retrieve relevant documents for a query."""
-        # Embed the query
-        query_embedding = self.embedding_model.embed_query(query, method=method)
-        
-        # Search in vector store
-        results = self.vector_store.search(query_embedding, top_k=top_k)
-        
-        return results, query_embedding
\ No newline at end of file
+        scores, chunk_ids, case_ids, query_embedding = self.retrieve_batch(
+            [query], top_k=top_k, method=method, return_embeddings=True
+        )
+
+        results = self.vector_store.format_results(scores[0], chunk_ids[0])
+        return results, query_embedding
@@ -1,58 +1,300 @@
+import os
 import faiss
 import pickle
 import numpy as np
 
+from src.models.chunk_store import (
+    ChunkTextStore, write_case_ids, load_case_ids, normalize_case_ids, load_token_counts
+)
+
+# Vector storage modes: None keeps raw float32 vectors
+SCALAR_QUANTIZERS = {
+    'float32': None,
+    'fp16': faiss.ScalarQuantizer.QT_fp16,
+    'int8': faiss.ScalarQuantizer.QT_8bit,
+}
+
 class VectorStore:
     def __init__(self):
         self.index = None
         self.mapping = None
         self.chunks = None
+        self.case_ids = None
+        self.vectors = None
+        self.rescore_factor = 0
+        self.token_counts = None
+        self.token_counts_meta = None
+        self._codes = None
+        self._n_cases = 0
+    
+    @staticmethod
+    def create_index(vectors, index_config=None):
+        """Create, train and fill a FAISS inner-product index of the configured type.
+
+        Supported types: flat (exact), ivf_flat, ivf_pq and hnsw. IVF quantizers
+        are trained on a random sample of at most train_sample vectors. With
+        storage set to fp16 or int8, flat/ivf_flat/hnsw keep scalar-quantized
+        codes instead of raw float32 vectors.
+        """
+        index_config = index_config or {}
+        index_type = index_config.get('type', 'flat')
+        storage = index_config.get('storage', 'float32')
+        if storage not in SCALAR_QUANTIZERS:
+            raise ValueError(f"Unknown vector storage: {storage}")
+        qtype = SCALAR_QUANTIZERS[storage]
+        n, dim = vectors.shape
+        
+        if index_type == 'flat':
+            if qtype is None:
+                index = faiss.IndexFlatIP(dim)
+            else:
+                index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+        elif index_type in ('ivf_flat', 'ivf_pq'):
+            # FAISS wants ~39 training points per list
+            nlist = max(1, min(index_config.get('nlist', 1024), n // 39))
+            quantizer = faiss.IndexFlatIP(dim)
+            if index_type == 'ivf_flat' and qtype is None:
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            elif index_type == 'ivf_flat':
+                index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexIVFPQ(
+                    quantizer, dim, nlist,
+                    index_config.get('pq_m', 64), index_config.get('pq_nbits', 8),
+                    faiss.METRIC_INNER_PRODUCT
+                )
+        elif index_type == 'hnsw':
+            if qtype is None:
+                index = faiss.IndexHNSWFlat(dim, index_config.get('hnsw_m', 32), faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexHNSWSQ(dim, qtype, index_config.get('hnsw_m', 32), faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = index_config.get('ef_construction', 200)
+        else:
+            raise ValueError(f"Unknown index type: {index_type}")
+        
+        if not index.is_trained:
+            sample_size = min(n, index_config.get('train_sample', 100000))
+            sample = vectors[np.random.default_rng(0).choice(n, sample_size, replace=False)]
+            index.train(sample)
+        
+        index.add(vectors)
+        VectorStore.apply_search_params(index, index_config)
+        return index
+    
+    @staticmethod
+    def apply_search_params(index, index_config=None):
+        """Set query-time knobs (nprobe for IVF, efSearch for HNSW) from the config."""
+        index_config = index_config or {}
+        params = faiss.ParameterSpace()
+        if 'nprobe' in index_config and faiss.try_extract_index_ivf(index) is not None:
+            params.set_index_parameter(index, "nprobe", index_config['nprobe'])
+        if 'ef_search' in index_config and isinstance(index, faiss.IndexHNSW):
+            params.set_index_parameter(index, "efSearch", index_config['ef_search'])
     
-    def build_faiss_index(self, embeddings, index_path, mapping_path, mapping_list, chunk_texts):
-        """Build FAISS index with cosine similarity and save it with ID mapping."""
+    @staticmethod
+    def needs_float_vectors(index_config):
+        """Whether float32 vectors are worth saving: re-scoring is on or the index is compressed."""
+        compressed = index_config.get('storage', 'float32') != 'float32' or index_config.get('type') == 'ivf_pq'
+        return bool(index_config.get('rescore_factor')) or compressed
+    
+    def build_faiss_index(self, embeddings, index_path, mapping_path, mapping_list, chunk_texts, chunk_text_path=None, index_config=None):
+        """Build FAISS index with cosine similarity and save it with ID mapping.
+
+        Mappings ending in .pkl are saved as legacy pickles; otherwise case ids
+        are saved as a fixed-width .npy array and chunk texts as a UTF-8 blob
+        with an offsets array, both memory-mapped by load_index().
+        """
         # Create FAISS index
-        self.index = faiss.IndexFlatIP(embeddings.shape[1])
-        self.index.add(embeddings.numpy().astype('float32'))
+        vectors = embeddings.numpy().astype('float32')
+        self.index = self.create_index(vectors, index_config)
         
         # Save index
         faiss.write_index(self.index, index_path)
         
-        # Save mapping
-        with open(mapping_path, "wb") as f:
-            pickle.dump(mapping_list, f)
+        # Keep full-precision vectors on disk for re-scoring, only when they can be used
+        if index_config and index_config.get('vectors_path') and self.needs_float_vectors(index_config):
+            np.save(index_config['vectors_path'], vectors)
+            print(f"✅ Saved float32 vectors to: {index_config['vectors_path']}")
         
-        # Save chunk texts
-        chunk_text_path = mapping_path.replace("mapping", "texts")
-        with open(chunk_text_path, "wb") as f:
-            pickle.dump(chunk_texts, f)
+        if chunk_text_path is None:
+            chunk_text_path = mapping_path.replace("mapping", "texts")
+            if not mapping_path.endswith(".pkl"):
+                chunk_text_path = os.path.splitext(chunk_text_path)[0] + ".bin"
         
-        self.mapping = mapping_list
+        if mapping_path.endswith(".pkl"):
+            # Save mapping
+            with open(mapping_path, "wb") as f:
+                pickle.dump(mapping_list, f)
+            
+            # Save chunk texts
+            with open(chunk_text_path, "wb") as f:
+                pickle.dump(chunk_texts, f)
+        else:
+            write_case_ids(mapping_list, mapping_path)
+            ChunkTextStore.write(chunk_texts, chunk_text_path)
+        
+        # Same case id dtype as after load_index()
+        self.case_ids = normalize_case_ids(mapping_list)
+        self._codes, self._n_cases = None, 0
+        self.mapping = mapping_list if mapping_path.endswith(".pkl") else self.case_ids
         self.chunks = chunk_texts
         
         print(f"✅ Saved FAISS index to: {index_path}")
         print(f"✅ Saved mapping to: {mapping_path}")
         print(f"✅ Saved chunk texts to: {chunk_text_path}")
     
-    def load_index(self, index_path, mapping_path, chunk_text_path):
-        """Load FAISS index and mappings."""
+    def load_index(self, index_path, mapping_path, chunk_text_path, index_config=None):
+        """Load FAISS index and mappings (legacy pickles or memory-mapped store)."""
         self.index = faiss.read_index(index_path)
+        self._codes, self._n_cases = None, 0
+        self.apply_search_params(self.index, index_config)
+        
+        index_config = index_config or {}
+        self.vectors, self.rescore_factor = None, 0
+        if index_config.get('rescore_factor') and os.path.exists(index_config.get('vectors_path') or ""):
+            self.vectors = np.load(index_config['vectors_path'], mmap_mode='r')
+            self.rescore_factor = index_config['rescore_factor']
         
-        with open(mapping_path, "rb") as f:
-            self.mapping = pickle.load(f)
+        if mapping_path.endswith(".pkl"):
+            with open(mapping_path, "rb") as f:
+                self.mapping = pickle.load(f)
+            
+            with open(chunk_text_path, "rb") as f:
+                self.chunks = pickle.load(f)
+            
+            self.case_ids = normalize_case_ids(self.mapping)
+        else:
+            self.mapping = load_case_ids(mapping_path)
+            self.chunks = ChunkTextStore(chunk_text_path)
+            self.case_ids = self.mapping
         
-        with open(chunk_text_path, "rb") as f:
-            self.chunks = pickle.load(f)
+        # Per-chunk generator token counts for prompt packing (counted on the fly when stale)
+        self.token_counts, self.token_counts_meta = None, None
+        if os.path.exists(index_config.get('token_counts_path') or ""):
+            counts, meta = load_token_counts(index_config['token_counts_path'])
+            if len(counts) == len(self.chunks):
+                self.token_counts, self.token_counts_meta = counts, meta
+            else:
+                print(f"⚠️ Ignoring {index_config['token_counts_path']}: "
+                      f"{len(counts)} counts for {len(self.chunks)} chunks")
         
         print("✅ Loaded FAISS index and mappings")
     
-    def search(self, query_embedding, top_k=5):
-        """Search for similar documents."""
+    @staticmethod
+    def rescore(query_embeddings, candidates, vectors, top_k):
+        """Exact inner products for candidate ids, returning the best top_k per query."""
+        valid = candidates >= 0
+        cand_vectors = vectors[np.where(valid, candidates, 0).ravel()].reshape(*candidates.shape, -1)
+        scores = np.einsum('qd,qcd->qc', query_embeddings, cand_vectors)
+        scores = np.where(valid, scores, -np.inf)
+        
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :top_k]
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+    
+    def search_batch(self, query_embeddings, top_k=5):
+        """Search a matrix of query embeddings in one FAISS call.
+
+        Returns (scores, chunk_ids, case_ids) arrays of shape (n_queries, top_k).
+        Padding positions returned by FAISS keep chunk id -1 and score -inf.
+        """
         if self.index is None:
             raise ValueError("Index not loaded. Call load_index() first.")
         
-        D, I = self.index.search(query_embedding.astype('float32'), top_k)
-        results = [
-            (self.chunks[i], float(D[0][idx]), self.mapping[i]) 
-            for idx, i in enumerate(I[0])
+        top_k = min(top_k, self.index.ntotal)
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+        if self.vectors is not None:
+            # Over-fetch from the compressed index, then re-score with float32 vectors
+            n_candidates = min(top_k * self.rescore_factor, self.index.ntotal)
+            _, candidates = self.index.search(query_embeddings, n_candidates)
+            D, I = self.rescore(query_embeddings, candidates, self.vectors, top_k)
+        else:
+            D, I = self.index.search(query_embeddings, top_k)
+        valid = I >= 0
+        D = np.where(valid, D, -np.inf)
+        case_ids = self.case_ids[np.where(valid, I, 0)]
+        return D, I, case_ids
+    
+    def score_chunks(self, query_embedding, chunk_ids):
+        """Exact inner products between one query and the given chunks."""
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        if self.vectors is not None:
+            vectors = np.asarray(self.vectors[chunk_ids], dtype='float32')
+        else:
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+                ivf.make_direct_map()
+            vectors = self.index.reconstruct_batch(chunk_ids)
+        return vectors @ np.asarray(query_embedding, dtype='float32').reshape(-1)
+    
+    def search_cases_batch(self, query_embeddings, top_k=5, overfetch=4, pooling="max"):
+        """Case-aware search: return the top_k distinct cases per query with their best chunks.
+
+        Over-fetches top_k * overfetch chunks, groups them by case id and pools
+        chunk scores per case with max or sum. Returns (scores, chunk_ids,
+        case_ids) like search_batch, where chunk_ids holds each case's best chunk.
+        """
+        D, I, _ = self.search_batch(query_embeddings, top_k=top_k * overfetch)
+        n_queries, n_candidates = I.shape
+        
+        # One integer key per (query, case) pair
+        codes, n_cases = self._case_codes()
+        valid = (I >= 0).ravel()
+        keys = (np.arange(n_queries)[:, None] * n_cases + codes[np.where(I >= 0, I, 0)]).ravel()[valid]
+        scores, chunk_ids = D.ravel()[valid], I.ravel()[valid]
+        
+        # Sort by key, best chunk first inside each group
+        order = np.lexsort((-scores, keys))
+        keys, scores, chunk_ids = keys[order], scores[order], chunk_ids[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        
+        if pooling == "sum":
+            group_scores = np.add.reduceat(scores, starts) if len(starts) else scores[:0]
+        elif pooling == "max":
+            group_scores = scores[starts]
+        else:
+            raise ValueError(f"Unknown case pooling: {pooling}")
+        group_queries = keys[starts] // n_cases
+        best_chunks = chunk_ids[starts]
+        
+        # Rank groups inside each query and keep the first top_k
+        order = np.lexsort((-group_scores, group_queries))
+        group_queries, group_scores, best_chunks = group_queries[order], group_scores[order], best_chunks[order]
+        first = np.searchsorted(group_queries, group_queries, side="left")
+        rank = np.arange(len(group_queries)) - first
+        keep = rank < top_k
+        
+        out_scores = np.full((n_queries, top_k), -np.inf, dtype='float32')
+        out_chunks = np.full((n_queries, top_k), -1, dtype=I.dtype)
+        out_scores[group_queries[keep], rank[keep]] = group_scores[keep]
+        out_chunks[group_queries[keep], rank[keep]] = best_chunks[keep]
+        return out_scores, out_chunks, self.case_ids[np.where(out_chunks >= 0, out_chunks, 0)]
+    
+    def _case_codes(self):
+        """Dense integer code per chunk for its case id (cached)."""
+        if self._codes is None:
+            uniques, self._codes = np.unique(np.asarray(self.case_ids), return_inverse=True)
+            self._n_cases = len(uniques)
+        return self._codes, self._n_cases
+    
+    def _case_id(self, i):
+        """Case id of chunk i as a plain Python value."""
+        case_id = self.case_ids[i]
+        return case_id.item() if isinstance(case_id, np.generic) else case_id
+    
+    def chunk_token_counts(self, chunk_ids):
+        """Generator token counts for the valid ids of one result row (None if not built)."""
+        if self.token_counts is None:
+            return None
+        return [int(self.token_counts[i]) for i in chunk_ids if i >= 0]
+    
+    def format_results(self, scores, chunk_ids):
+        """Turn one row of search_batch output into (chunk_text, score, case_id) tuples."""
+        return [
+            (self.chunks[i], float(score), self._case_id(i))
+            for score, i in zip(scores, chunk_ids) if i >= 0
         ]
-        return results
\ No newline at end of file
+    
+    def search(self, query_embedding, top_k=5):
+        """Search for similar documents."""
+        D, I, _ = self.search_batch(query_embedding[:1], top_k=top_k)
+        return self.format_results(D[0], I[0])
@@ -0,0 +1,37 @@
+import json
+import time
+import urllib.request
+
+class RAGClient:
+    """Thin HTTP client for RAGServer with the same answer API as LegalRAGModel."""
+
+    def __init__(self, url, timeout=120):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            self.url + path, data=data,
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def generate_answer(self, question, top_k=3, threshold=0.6):
+        """Answer one question on the server (top_k/threshold are set server-side)."""
+        return self._request("/answer", {"question": question})["answer"]
+
+    def generate_answer_stream(self, question, top_k=3, threshold=0.6, metrics=None):
+        """Yield the server's answer once; the batched server does not stream tokens."""
+        start = time.perf_counter()
+        answer = self.generate_answer(question)
+        if metrics is not None:
+            metrics['total_time'] = time.perf_counter() - start
+        yield answer
+
+    def health(self):
+        return self._request("/health")
+
+    def metrics(self):
+        return self._request("/metrics")
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+class MicroBatcher:
+    """Collect submitted items into batches and run them through a blocking function.
+
+    A batch is dispatched as soon as it holds max_batch_size items or
+    max_wait_ms has passed since its first item arrived. process_batch runs
+    in a dedicated single-thread executor, so at most one batch per stage
+    is in flight while the event loop keeps accepting requests.
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=20, name="batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.batch_sizes = []
+        self.batch_times = []
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item):
+        """Queue one item and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for a first item, then fill the batch until it is full or the wait expires."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batch_sizes.append(len(batch))
+            self.batch_times.append(time.perf_counter() - start)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": len(self.batch_sizes),
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            "max_batch_size": max(self.batch_sizes, default=0),
+            "mean_batch_time": float(np.mean(self.batch_times)) if self.batch_times else 0.0,
+            "queued": self.queue.qsize()
+        }
+
+
+class RAGServer:
+    """Asyncio HTTP inference service around a loaded LegalRAGModel.
+
+    Questions are micro-batched through two stages, retrieval
+    (prepare_prompts) and generation (generate_from_prompts), each with its
+    own batcher, so the retrieval of one batch overlaps the generation of
+    the previous one.
+
+    Endpoints:
+        POST /answer   {"question": "..."}  -> {"answer": "...", "latency": s, "usage": {...}}
+        GET  /health   -> {"status": "ok"}
+        GET  /metrics  -> request counts, latency percentiles and batch stats
+    """
+
+    def __init__(self, rag_model, top_k=3, threshold=0.6, max_batch_size=16, max_wait_ms=20,
+                 generation_batch_size=8):
+        self.rag_model = rag_model
+        self.top_k = top_k
+        self.threshold = threshold
+        self.generation_batch_size = generation_batch_size
+        self.retrieval_batcher = MicroBatcher(
+            self._retrieve_stage, max_batch_size, max_wait_ms, name="retrieval"
+        )
+        self.generation_batcher = MicroBatcher(
+            self._generate_stage, max_batch_size, max_wait_ms, name="generation"
+        )
+        self.latencies = deque(maxlen=10000)
+        self.requests = 0
+        self.errors = 0
+        self.started = time.time()
+
+    def _retrieve_stage(self, questions):
+        return self.rag_model.prepare_prompts(questions, top_k=self.top_k, threshold=self.threshold)
+
+    def _generate_stage(self, items):
+        questions = [question for question, _ in items]
+        prepared = [item for _, item in items]
+        return self.rag_model.generate_from_prompts(
+            questions, prepared, batch_size=self.generation_batch_size
+        )
+
+    async def answer(self, question):
+        """Run one question through both batched stages; returns (answer, prompt token usage)."""
+        prepared = await self.retrieval_batcher.submit(question)
+        usage = self.rag_model.prompt_usage(prepared)
+        if isinstance(prepared, str):
+            return prepared, usage
+        return await self.generation_batcher.submit((question, prepared)), usage
+
+    def metrics(self):
+        latencies = np.asarray(self.latencies)
+        percentiles = (
+            {f"p{p}": float(np.percentile(latencies, p)) for p in (50, 95, 99)}
+            if len(latencies) else {}
+        )
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "uptime": time.time() - self.started,
+            "load_times": dict(self.rag_model.load_report),
+            "latency": percentiles,
+            "retrieval": self.retrieval_batcher.stats(),
+            "generation": self.generation_batcher.stats(),
+            "answer_cache": self.rag_model.answer_cache.stats() if self.rag_model.answer_cache is not None else None
+        }
+
+    async def _handle_answer(self, body):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            payload = None
+        question = payload.get("question") if isinstance(payload, dict) else None
+        if not isinstance(question, str):
+            return 400, {"error": "expected JSON body {\"question\": \"...\"}"}
+
+        start = time.perf_counter()
+        answer, usage = await self.answer(question)
+        latency = time.perf_counter() - start
+        self.latencies.append(latency)
+        return 200, {"answer": answer, "latency": latency, "usage": usage}
+
+    async def _route(self, method, path, body):
+        if method == "POST" and path == "/answer":
+            self.requests += 1
+            return await self._handle_answer(body)
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics()
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def _handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection (keep-alive until the client closes)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = await self._route(method, path.split("?")[0], body)
+                except Exception as e:
+                    self.errors += 1
+                    status, payload = 500, {"error": str(e)}
+
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                keep_alive = headers.get("connection", "keep-alive").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="0.0.0.0", port=8000):
+        self.retrieval_batcher.start()
+        self.generation_batcher.start()
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"🚀 Serving on http://{host}:{port} (POST /answer, GET /health, GET /metrics)")
+        async with server:
+            await server.serve_forever()
+
+    def run(self, host="0.0.0.0", port=8000):
+        asyncio.run(self.serve(host, port))
@@ -3,7 +3,7 @@ from transformers import (
     AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments, 
     DataCollatorForLanguageModeling
 )
-import pandas as pd
+from src.utils.helpers import read_table
 
 class LegalModelTrainer:
     def __init__(self, model_name, output_dir):
@@ -17,8 +17,8 @@ class LegalModelTrainer:
             self.tokenizer.pad_token = self.tokenizer.eos_token
     
     def prepare_dataset(self, qa_file_path):
-        """Prepare dataset from QA Excel file."""
-        df = pd.read_excel(qa_file_path)
+        """Prepare dataset from the QA table (Parquet or Excel)."""
+        df = read_table(qa_file_path, columns=['question', 'context', 'answer'])
         
         def format_example(example):
             prompt = f"السؤال: {example['question']}\nالنص المرجعي: {example['context']}\nالجواب:"
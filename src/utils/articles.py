@@ -0,0 +1,89 @@
+import re
+
+from src.utils.helpers import normalize_arabic
+
+# "المادة 12 من قانون ..." / "المواد 5 و 6 - 9 من قانون ..."; "الى" is the normalize_arabic form of "إلى"
+ARTICLE_PATTERN = re.compile(r"(?:المادة|المواد)\s+((?:[\d\sوو\-إلى]|الى)+)\s*(?:من\s+(قانون\s+[^\nو\.]*))?")
+# Law mentioned on its own ("قانون العمل"), not as part of a longer word
+LAW_PATTERN = re.compile(r"(?<!\w)قانون\s+[^\nو\.؟?]*")
+ARTICLES_HEADER = "✅ المواد القانونية المستخرجة:\n"
+_NUMBER_TOKEN_PATTERN = re.compile(r"\d+|إلى|الى")
+# Longest "N إلى M" span expanded to every article in between
+MAX_ARTICLE_RANGE = 50
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+
+def find_article_references(text):
+    """Return (articles, law_name) references in text, cleaned as in the generated-answer path."""
+    if not isinstance(text, str):
+        return []
+    references = []
+    for articles, law in ARTICLE_PATTERN.findall(text):
+        law_name = law.strip() if law else ""
+        cleaned_articles = articles.replace("-", "إلى").replace("—", "إلى").replace("  ", " ").strip()
+        references.append((cleaned_articles, law_name))
+    return references
+
+def format_article_references(references):
+    """Render references the way extract_articles_with_law does."""
+    return ARTICLES_HEADER + "\n".join(f"المواد {articles} {law}" for articles, law in references)
+
+def parse_article_answer(answer):
+    """Inverse of format_article_references: (articles, law_name) per answer line."""
+    if not isinstance(answer, str) or not answer.startswith(ARTICLES_HEADER):
+        return []
+    references = []
+    for line in answer[len(ARTICLES_HEADER):].splitlines():
+        if line.startswith("المواد "):
+            articles, _, law = line[len("المواد "):].partition("قانون")
+            references.append((articles.strip(), "قانون" + law if law else ""))
+    return references
+
+def find_law_names(text):
+    """Law names mentioned anywhere in text (with or without an article number)."""
+    if not isinstance(text, str):
+        return []
+    return [law.strip() for law in LAW_PATTERN.findall(text) if law.strip() != "قانون"]
+
+def article_numbers(articles):
+    """Article numbers of an extracted span, expanding "5 إلى 9" ranges."""
+    numbers = []
+    in_range = False
+    for token in _NUMBER_TOKEN_PATTERN.findall(articles):
+        if not token.isdigit():
+            in_range = bool(numbers)
+            continue
+        number = int(token)
+        if in_range and numbers[-1] < number <= numbers[-1] + MAX_ARTICLE_RANGE:
+            numbers.extend(range(numbers[-1] + 1, number + 1))
+        else:
+            numbers.append(number)
+        in_range = False
+    return numbers
+
+def normalize_law_name(law):
+    """Canonical law name for matching: normalized Arabic without punctuation or the leading "قانون"."""
+    law = _PUNCTUATION_PATTERN.sub(" ", normalize_arabic(law or "")).strip()
+    if law.startswith("قانون"):
+        law = law[len("قانون"):]
+    return " ".join(law.split())
+
+def article_keys(references):
+    """Expand references to a set of (article number, normalized law) pairs."""
+    return {
+        (number, normalize_law_name(law))
+        for articles, law in references
+        for number in article_numbers(articles)
+    }
+
+def rank_article_references(retrieval_results, max_references=10):
+    """References found in retrieved chunks, deduplicated and ordered by the best chunk score."""
+    best = {}
+    for text, score, _ in retrieval_results:
+        for articles, law in find_article_references(text):
+            key = (tuple(article_numbers(articles)), normalize_law_name(law))
+            if not key[0]:
+                continue
+            if key not in best or score > best[key][0]:
+                best[key] = (score, articles, law)
+    ranked = sorted(best.values(), key=lambda item: -item[0])
+    return [(articles, law) for _, articles, law in ranked[:max_references]]
@@ -1,14 +1,55 @@
 import re
+import sys
+import time
+import atexit
+import pickle
+import signal
+import threading
 import pandas as pd
-import torch
 import yaml
 import os
+from contextlib import contextmanager
 
 def load_config(config_path="config/config.yaml"):
     """Load configuration from YAML file."""
     with open(config_path, 'r', encoding='utf-8') as file:
         return yaml.safe_load(file)
 
+def build_rag_config(config, generator_model_path, device):
+    """Build the LegalRAGModel config dict from the YAML configuration."""
+    retrieval = config.get('retrieval', {})
+    return {
+        'embedding_model': config['model']['embedding_model'],
+        'generator_model_path': generator_model_path,
+        'device': device,
+        'query_cache_size': retrieval.get('query_cache_size', 0),
+        'query_cache_path': retrieval.get('query_cache_path'),
+        'group_by_case': retrieval.get('group_by_case', False),
+        'case_overfetch': retrieval.get('case_overfetch', 4),
+        'case_pooling': retrieval.get('case_pooling', 'max'),
+        'fusion': retrieval.get('fusion'),
+        'fusion_weight': retrieval.get('fusion_weight', 0.3),
+        'fusion_overfetch': retrieval.get('fusion_overfetch', 4),
+        'article_filter': retrieval.get('article_filter', False),
+        'article_max_candidates': retrieval.get('article_max_candidates', 2000),
+        'index': config.get('index', {}),
+        'generation': config.get('generation', {}),
+        'answer_cache': config.get('answer_cache', {}),
+        'startup': config.get('startup', {}),
+        'cpu_inference': config.get('cpu_inference', {}),
+        'embedding': config.get('embedding', {})
+    }
+
+# Single translation table for every per-character rule of normalize_arabic
+_ARABIC_TRANSLATION = str.maketrans({
+    **dict.fromkeys('ُِّٰۥۦۧۨ۩ۭ'),  # Remove diacritics (Tashkeel)
+    'إ': 'ا', 'أ': 'ا', 'آ': 'ا',  # Normalize Alef
+    'ؤ': 'و',  # Convert hamza-Waw to Waw
+    '“': '"', '”': '"',  # Normalize double quotes
+    '‘': "'", '’': "'",  # Normalize apostrophes
+})
+_NORMALIZE_CHARS_PATTERN = re.compile('[' + ''.join(chr(c) for c in _ARABIC_TRANSLATION) + ']')
+
 def normalize_arabic(text):
     """
     Normalize Arabic text:
@@ -19,16 +60,49 @@ def normalize_arabic(text):
     """
     if not isinstance(text, str):
         return text
-    text = re.sub(r'[ُِّٰۥۦۧۨ۩ۭ]', '', text)  # Remove diacritics (Tashkeel)
-    text = re.sub(r'[إأآا]', 'ا', text)  # Normalize Alef
-    text = re.sub(r'ؤ', 'و', text)  # Convert hamza-Waw to Waw
-    text = re.sub(r'["""]', '"', text)  # Normalize double quotes
-    text = re.sub(r'[''']', "'", text)  # Normalize apostrophes
-    text = re.sub(r'\s+', ' ', text).strip()  # Remove extra spaces
-    return text
+    if _NORMALIZE_CHARS_PATTERN.search(text):  # Most cells need no character mapping
+        text = text.translate(_ARABIC_TRANSLATION)
+    return ' '.join(text.split())  # Remove extra spaces
+
+def normalize_arabic_batch(values):
+    """Normalize a whole column (pandas Series) or list of values in a single pass."""
+    normalized = [normalize_arabic(value) for value in values]
+    if isinstance(values, pd.Series):
+        return pd.Series(normalized, index=values.index, name=values.name, dtype=values.dtype)
+    return normalized
+
+def read_table(path, columns=None):
+    """Read a table from Parquet (pipeline format) or Excel (import edge), optionally only some columns.
+
+    A missing .parquet table falls back to its .xlsx sibling, so checkouts
+    that only ship the Excel exports keep working until the pipeline reruns.
+    """
+    if path.endswith(".parquet") and not os.path.exists(path):
+        excel_path = os.path.splitext(path)[0] + ".xlsx"
+        if os.path.exists(excel_path):
+            print(f"⚠️ {path} not found, reading {excel_path}")
+            path = excel_path
+    if path.endswith(".parquet"):
+        if columns is not None:
+            import pyarrow.parquet as pq
+            available = pq.read_schema(path).names
+            columns = [col for col in columns if col in available]
+        return pd.read_parquet(path, columns=columns)
+    
+    usecols = (lambda col: col in columns) if columns is not None else None
+    return pd.read_excel(path, usecols=usecols)
+
+def write_table(df, path):
+    """Write a table as Parquet, or as Excel when exporting to a .xlsx path."""
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False)
 
 def setup_device():
     """Setup and return the appropriate device."""
+    import torch
+    
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print(f"Using device: {device}")
     return device
@@ -40,4 +114,43 @@ def create_directories():
         "models/trained", "results", "logs"
     ]
     for dir_path in dirs:
-        os.makedirs(dir_path, exist_ok=True)
\ No newline at end of file
+        os.makedirs(dir_path, exist_ok=True)
+
+@contextmanager
+def timed(report, name):
+    """Add the wall time of the with-block to report[name] (seconds)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report[name] = report.get(name, 0.0) + time.perf_counter() - start
+
+def save_pickle(obj, path):
+    """Pickle obj to a temp file, then replace path, so a crash never leaves a truncated file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(obj, f)
+    os.replace(tmp_path, path)
+
+def load_pickle(path, default=None):
+    """Unpickle path, or warn and return default when the file is unreadable or corrupt."""
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable cache file {path}: {e!r}")
+        return default
+
+def _exit_on_sigterm(signum, frame):
+    sys.exit(128 + signum)  # SystemExit unwinds normally, so atexit handlers run
+
+def save_on_exit(save):
+    """Call save at interpreter exit, including on SIGTERM (how docker, systemd and k8s stop a process).
+
+    The SIGTERM handler is only installed from the main thread and when
+    nothing else has claimed the signal.
+    """
+    atexit.register(save)
+    if threading.current_thread() is threading.main_thread() and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, _exit_on_sigterm)
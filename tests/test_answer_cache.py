@@ -0,0 +1,26 @@
+import numpy as np
+
+from src.models.answer_cache import SemanticAnswerCache
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "answer_cache.pkl")
+    cache = SemanticAnswerCache(threshold=0.9)
+    embedding = np.ones(4, dtype=np.float32) / 2
+    cache.put(embedding, [1, 2, 3], "الجواب", variant=("greedy", "general"))
+    cache.save(path)
+
+    loaded = SemanticAnswerCache(threshold=0.9, path=path)
+    assert len(loaded) == 1
+    assert loaded.lookup(embedding, [3, 2, 1], variant=("greedy", "general")) == "الجواب"
+    assert loaded.lookup(embedding, [1, 2, 3], variant=("beam", "general")) is None
+
+def test_truncated_file_starts_empty(tmp_path):
+    path = tmp_path / "answer_cache.pkl"
+    cache = SemanticAnswerCache()
+    cache.put(np.ones(4, dtype=np.float32), [1], "الجواب")
+    cache.save(str(path))
+    path.write_bytes(path.read_bytes()[:10])
+
+    loaded = SemanticAnswerCache(path=str(path))
+    assert len(loaded) == 0
+    assert not (tmp_path / "answer_cache.pkl.tmp").exists()
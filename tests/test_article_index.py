@@ -0,0 +1,58 @@
+import numpy as np
+
+from src.models.article_index import ArticleIndex
+from src.utils.articles import article_numbers, find_article_references
+from src.utils.helpers import normalize_arabic
+
+CHUNKS = [
+    "المادة 5 من قانون العمل",
+    "المواد 5 إلى 9 من قانون الأسرة",
+    "تطبق المادة 12 من قانون المرافعات المدنية على النزاع",
+    "نص لا يذكر أي مادة",
+]
+
+def test_article_numbers_expands_ranges():
+    assert article_numbers("5 إلى 9") == [5, 6, 7, 8, 9]
+    assert article_numbers("5 الى 7") == [5, 6, 7]
+    assert article_numbers("3 و 10") == [3, 10]
+    assert article_numbers("9 إلى 5") == [9, 5]
+
+def test_normalized_range_keeps_law():
+    assert find_article_references(normalize_arabic(CHUNKS[1])) == [("5 الى 9", "قانون الاسرة")]
+
+def test_range_query_matches_only_its_law():
+    index = ArticleIndex().build(CHUNKS)
+    assert index.search("المواد 5 إلى 9 من قانون الأسرة").tolist() == [1]
+    assert index.search("المادة 7 من قانون الاسرة").tolist() == [1]
+
+def test_normalized_chunks_index_ranges():
+    index = ArticleIndex().build([normalize_arabic(chunk) for chunk in CHUNKS])
+    assert index.search("المادة 8 من قانون الأسرة").tolist() == [1]
+
+def test_law_matching():
+    index = ArticleIndex().build(CHUNKS)
+    assert index.search("ما هي المادة 5 من قانون العمل؟").tolist() == [0]
+    assert index.search("ما نص المادة 5").tolist() == [0, 1]
+    assert index.search("المادة 12 من قانون المرافعات").tolist() == [2]
+    assert index.search("ما هي مواد قانون المرافعات المدنية").tolist() == [2]
+    assert index.search("المادة 5 من قانون التجارة").tolist() == []
+    assert index.search("سؤال عادي").tolist() == []
+
+def test_empty_index(tmp_path):
+    index = ArticleIndex().build([])
+    assert len(index) == 0
+    assert index.search("المادة 5 من قانون العمل").tolist() == []
+
+    path = tmp_path / "articles.npz"
+    index.save(path)
+    loaded = ArticleIndex.load(path)
+    assert len(loaded) == 0 and loaded.n_docs == 0
+    assert loaded.search("ما هي مواد قانون العمل").dtype == np.int64
+
+def test_save_load_roundtrip(tmp_path):
+    index = ArticleIndex().build(CHUNKS)
+    path = tmp_path / "articles.npz"
+    index.save(path)
+    loaded = ArticleIndex.load(path)
+    assert loaded.keys() == index.keys()
+    assert loaded.search("المادة 6 من قانون الأسرة").tolist() == [1]
@@ -0,0 +1,19 @@
+from src.models.lexical_index import BM25Index, analyze, light_stem
+
+def test_law_noun_and_adjective_share_a_stem():
+    assert set(analyze("قانون القانون قانوني القانونية")) == {"قانون"}
+
+def test_plural_suffixes_need_a_long_stem():
+    assert light_stem("العاملون") == "عامل"
+    assert light_stem("قرارات") == "قرار"
+    assert light_stem("قانون") == "قانون"
+
+def test_prefixes_and_stopwords():
+    assert analyze("والمحكمة في الدعوى") == ["محكم", "دعوى"]
+    assert analyze("المادة 12") == ["ماد", "12"]
+    assert analyze(None) == []
+
+def test_bm25_matches_derived_forms():
+    index = BM25Index().build(["نص القانون المدني", "حكم المحكمة الابتدائية"])
+    _, doc_ids = index.search("القوانين و القانونية", top_k=2)
+    assert doc_ids.tolist() == [0]
@@ -0,0 +1,55 @@
+import math
+import os
+import random
+
+import pandas as pd
+import pytest
+
+from src.utils.helpers import normalize_arabic, normalize_arabic_batch, read_table
+from tests.normalization_reference import fuzz_strings, normalize_arabic_reference
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PATHS = [
+    os.path.join(ROOT, "data", "processed", "legal_cases_data_cleaned.xlsx"),
+    os.path.join(ROOT, "data", "processed", "qa_legal_rag_cleaned.xlsx"),
+]
+
+def same(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return type(a) is type(b) and a == b
+
+def corpus_samples(limit=2000):
+    values = []
+    for path in CORPUS_PATHS:
+        if os.path.exists(path):
+            df = read_table(path)
+            for col in df.columns:
+                values.extend(df[col].tolist())
+    return random.Random(0).sample(values, min(limit, len(values)))
+
+@pytest.mark.parametrize("value", [
+    "", " ", "   \t\n ", "أَحْمَد  إلى   آخر", "“quoted” ‘single’", "مؤسسة 　قانونية",
+    None, float("nan"), 42, 3.5, b"bytes", ["list"],
+])
+def test_edge_cases_match_reference(value):
+    assert same(normalize_arabic(value), normalize_arabic_reference(value))
+
+def test_fuzz_matches_reference():
+    for text in fuzz_strings(5000):
+        assert normalize_arabic(text) == normalize_arabic_reference(text)
+
+def test_corpus_matches_reference():
+    samples = corpus_samples()
+    if not samples:
+        pytest.skip("no cleaned corpus tables in data/processed")
+    for value in samples:
+        assert same(normalize_arabic(value), normalize_arabic_reference(value))
+
+def test_batch_matches_single_values():
+    values = ["أحمد", None, float("nan"), 7, "  إلى  "]
+    series = pd.Series(values, dtype=object, name="col")
+    batch = normalize_arabic_batch(series)
+    assert isinstance(batch, pd.Series) and batch.name == "col"
+    assert all(same(a, normalize_arabic_reference(b)) for a, b in zip(batch, values))
+    assert all(same(a, normalize_arabic_reference(b)) for a, b in zip(normalize_arabic_batch(values), values))
@@ -0,0 +1,21 @@
+import numpy as np
+
+from src.models.embedding_cache import QueryEmbeddingCache
+
+def test_key_normalizes_query():
+    assert QueryEmbeddingCache.make_key("قانونُ  العمل", "mean", "e5") == QueryEmbeddingCache.make_key("قانون العمل", "mean", "e5")
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "query_cache.pkl")
+    cache = QueryEmbeddingCache(max_size=10)
+    key = QueryEmbeddingCache.make_key("قانون العمل", "mean", "e5")
+    cache.put(key, np.ones(4, dtype=np.float32))
+    cache.save(path)
+
+    loaded = QueryEmbeddingCache(max_size=10, path=path)
+    assert np.array_equal(loaded.get(key), np.ones(4, dtype=np.float32))
+
+def test_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / "query_cache.pkl"
+    path.write_bytes(b"\x80\x04not a pickle")
+    assert len(QueryEmbeddingCache(path=str(path))) == 0